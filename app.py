@@ -1,23 +1,64 @@
 import os
+import json
 import shutil
 import tempfile
-import zipfile
-import pandas as pd
+import time
 import uuid
-from flask import Flask, render_template, request, send_file
+import zipfile
+from flask import Flask, Request, Response, abort, jsonify, render_template, request, send_file, url_for
+from werkzeug.exceptions import HTTPException
+from werkzeug.utils import safe_join
 
 from tep_preprocess import run_tep_preprocessing
 from tep_postprocess import run_tep_postprocessing
 from legacy_preprocess import run_legacy_preprocessing
 from legacy_postprocess import run_legacy_postprocessing
-from final_compare import run_final_comparison_from_zip
+from final_compare import (
+    REPORT_COLUMNS, SUMMARY_COLUMNS, aggregate_issues, compare_uploads, load_report_rows, save_report,
+)
+from checkpoints import Checkpoint, finish_job, job_lock, open_job, upload_digest
+from uploads import MAX_UPLOAD_BYTES, MB, UploadTooLarge, extract_zip_upload, save_upload, spooled_stream
+
+class SpoolingRequest(Request):
+    """Spools each uploaded file in memory up to the configured threshold, then to disk."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return spooled_stream()
 
 app = Flask(__name__)
 app.secret_key = 'localization_secret'
+app.request_class = SpoolingRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 
+# Each /process run publishes its outputs under its own id, so concurrent requests in
+# other threads or workers never overwrite each other's files
 TEMP_OUTPUT = "static/processed_files"
+OUTPUT_TTL = int(os.environ.get("OUTPUT_TTL_HOURS", "24")) * 3600
 os.makedirs(TEMP_OUTPUT, exist_ok=True)
 
+def prune_outputs():
+    cutoff = time.time() - OUTPUT_TTL
+    for name in os.listdir(TEMP_OUTPUT):
+        path = os.path.join(TEMP_OUTPUT, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass  # removed by another worker meanwhile
+
+@app.before_request
+def reject_oversized_upload():
+    # Refuse on the announced Content-Length, before any of the body is read
+    if request.content_length and request.content_length > MAX_UPLOAD_BYTES:
+        abort(413)
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    message = f"Upload exceeds the {MAX_UPLOAD_BYTES // MB} MB limit"
+    if request.path.startswith('/api/'):
+        return jsonify(status="error", message=message), 413
+    return render_template("error.html", message=message), 413
+
 @app.route('/')
 def index():
     return render_template('ui.html')
@@ -35,109 +76,307 @@ def final_compare():
         if not source_files or not translated_zip:
             return render_template("error.html", message="Missing source files or translated ZIP")
 
-        output_path, token, report_name, report_data = run_final_comparison_from_zip(source_files, translated_zip)
+        token, report_name, report_data, summary = compare_uploads(
+            source_files, translated_zip, backend=request.form.get('backend') or None)
 
-        headers = ["File Name", "Language", "Issue Type", "Key", "Source", "Target", "Details"]
-        rows = [[
-            r.get("File Name", ""), r.get("Language", ""), r.get("Issue Type", ""),
-            r.get("Key", ""), r.get("Source", ""), r.get("Target", ""), r.get("Details", "")
-        ] for r in report_data]
-
-        return render_template("compare_results.html", headers=headers, rows=rows,
-                               report_url=f"/temp_download/{token}", report_name=report_name)
+        return render_summary(token, report_name, report_data, summary)
 
     except Exception as e:
         return render_template("error.html", message=str(e))
 
-@app.route('/temp_download/<token>')
-def temp_download(token):
+def render_summary(token, report_name, report_data, summary):
+    """The compact default view: one row per aggregated finding, with drill-down links."""
+    return render_template("compare_results.html", headers=SUMMARY_COLUMNS, summary=summary,
+                           total=sum(group["Count"] for group in summary), token=token,
+                           report_url=f"/temp_download/{token}", report_name=report_name)
+
+def find_report(token):
+    """Returns (path, download name) of the Excel report stored for a token, or None."""
     temp_dir = tempfile.gettempdir()
     for fname in os.listdir(temp_dir):
         if fname.startswith(token + "__") and fname.endswith(".xlsx"):
-            path = os.path.join(temp_dir, fname)
-            original_name = fname.split("__", 1)[1]
-            return send_file(path, as_attachment=True, download_name=original_name)
+            return os.path.join(temp_dir, fname), fname.split("__", 1)[1]
+    return None
+
+@app.route('/compare/<token>')
+def compare_summary(token):
+    report = find_report(token)
+    report_data = load_report_rows(token)
+    if report is None or report_data is None:
+        return "Report not found", 404
+    return render_summary(token, report[1], report_data, aggregate_issues(report_data))
+
+@app.route('/compare/<token>/details')
+def compare_details(token):
+    report = find_report(token)
+    report_data = load_report_rows(token)
+    if report is None or report_data is None:
+        return "Report not found", 404
+
+    group = None
+    index = request.args.get('group', type=int)
+    if index is not None:
+        summary = aggregate_issues(report_data)
+        if not 0 <= index < len(summary):
+            return "Group not found", 404
+        group = summary[index]
+        report_data = [report_data[i] for i in group["Rows"]]
+
+    rows = [[r.get(col, "") for col in REPORT_COLUMNS] for r in report_data]
+    return render_template("compare_details.html", headers=REPORT_COLUMNS, rows=rows, group=group,
+                           token=token, report_url=f"/temp_download/{token}", report_name=report[1])
+
+@app.route('/temp_download/<token>')
+def temp_download(token):
+    report = find_report(token)
+    if report:
+        path, original_name = report
+        return send_file(path, as_attachment=True, download_name=original_name)
     return "File not found", 404
 
-@app.route('/process', methods=['POST'])
-def process():
+def extract_base_zip(job_dir):
+    """Extracts the optional ZIP of existing target bundles that postprocessing patches."""
+    base_zip = request.files.get('base_zip')
+    if not base_zip or not base_zip.filename:
+        return None
+    return extract_zip_upload(base_zip, os.path.join(job_dir, 'Base'))
+
+def run_process():
+    """
+    Runs the /process workflow for the current request and returns
+    (job_id, output_files, errors, qa); failures raise.
+    """
     workflow = request.form.get('workflow')
     process_type = request.form.get('processType')
     xliff_version = request.form.get('xliff_version', '1.2')
+    single_file = request.form.get('single_file') == 'on'
+    dedup = request.form.get('dedup') == 'on'
+    inline_codes = request.form.get('inline_codes') == 'on'
+    # Delta preprocessing exports changed keys; delta postprocessing merges them back
+    delta = request.form.get('delta_mode' if process_type == 'preprocess' else 'delta_merge') == 'on'
+    # QA rows are collected while postprocessing, from the pairs already in the XLIFFs
+    qa_rows = [] if request.form.get('qa_gate') == 'on' else None
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        input_dir = os.path.join(temp_dir, 'Input')
-        output_dir = os.path.join(temp_dir, 'Output')
-        os.makedirs(input_dir, exist_ok=True)
-        os.makedirs(output_dir, exist_ok=True)
+    # Work happens in a job dir keyed by the uploads and options: finished (file, language)
+    # units are checkpointed there, so resubmitting after a crash only does the remainder
+    options = (workflow, process_type, xliff_version, single_file, dedup, inline_codes, delta, qa_rows is not None)
+    job_dir = open_job(upload_digest([f for _, f in request.files.items(multi=True)], options))
+    # An identical request already running elsewhere owns the job dir until it is done
+    with job_lock(job_dir):
+        return run_process_job(job_dir, workflow, process_type, xliff_version, single_file, dedup,
+                               inline_codes, delta, qa_rows)
 
-        try:
-            if workflow == 'legacy' and process_type == 'preprocess':
-                for file in request.files.getlist('source_files'):
-                    filename = file.filename
-                    if filename:
-                        file.save(os.path.join(input_dir, f"source_{filename}"))
-
-                target_zip = request.files.get('target_zip')
-                if target_zip and target_zip.filename:
-                    zip_path = os.path.join(input_dir, 'target_langs.zip')
-                    target_zip.save(zip_path)
-                    extract_dir = os.path.join(input_dir, 'targets')
-                    os.makedirs(extract_dir, exist_ok=True)
-                    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                        zip_ref.extractall(extract_dir)
-
-            else:
-                for file in request.files.getlist('files'):
-                    filename = file.filename
-                    if filename:
-                        file.save(os.path.join(input_dir, filename))
-
-            if workflow == 'tep':
-                if process_type == 'preprocess':
-                    run_tep_preprocessing(input_dir, output_dir, version=xliff_version)
-                else:
-                    run_tep_postprocessing(input_dir, output_dir)
-                errors = []
-            else:
-                if process_type == 'preprocess':
-                    errors = run_legacy_preprocessing(input_dir, output_dir, version=xliff_version)
-                else:
-                    run_legacy_postprocessing(input_dir, output_dir)
-                    errors = []
-
-            if os.path.exists(TEMP_OUTPUT):
-                shutil.rmtree(TEMP_OUTPUT)
-            shutil.copytree(output_dir, TEMP_OUTPUT)
-
-            zip_path = os.path.join(TEMP_OUTPUT, "batch.zip")
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, _, files in os.walk(TEMP_OUTPUT):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, TEMP_OUTPUT)
-                        if not arcname.endswith("batch.zip"):
-                            zipf.write(file_path, arcname)
-
-            output_files = []
-            for root, _, files in os.walk(TEMP_OUTPUT):
-                for file in files:
-                    rel_path = os.path.relpath(os.path.join(root, file), TEMP_OUTPUT)
-                    if not rel_path.endswith("batch.zip"):
-                        output_files.append(rel_path.replace("\\", "/"))
-
-            return render_template("results.html", files=output_files, errors=errors)
-
-        except Exception as e:
-            return render_template("error.html", message=str(e))
-
-@app.route('/download/<path:filename>')
-def download(filename):
-    file_path = os.path.join(TEMP_OUTPUT, filename)
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
+def run_process_job(job_dir, workflow, process_type, xliff_version, single_file, dedup, inline_codes,
+                    delta, qa_rows):
+    checkpoint = Checkpoint(job_dir)
+
+    input_dir = os.path.join(job_dir, 'Input')
+    output_dir = os.path.join(job_dir, 'Output')
+    os.makedirs(input_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if workflow == 'legacy' and process_type == 'preprocess':
+        for file in request.files.getlist('source_files'):
+            filename = file.filename
+            if filename:
+                save_upload(file, os.path.join(input_dir, f"source_{filename}"))
+
+        target_zip = request.files.get('target_zip')
+        if target_zip and target_zip.filename:
+            extract_zip_upload(target_zip, os.path.join(input_dir, 'targets'))
+
+    else:
+        for file in request.files.getlist('files'):
+            filename = file.filename
+            if filename:
+                save_upload(file, os.path.join(input_dir, filename))
+
+    if workflow == 'tep':
+        if process_type == 'preprocess':
+            snapshot_path = None
+            snapshot_file = request.files.get('snapshot_file')
+            if delta and snapshot_file and snapshot_file.filename:
+                snapshot_path = os.path.join(job_dir, 'snapshot.json')
+                save_upload(snapshot_file, snapshot_path)
+            errors = run_tep_preprocessing(input_dir, output_dir, version=xliff_version,
+                                           delta=delta, snapshot_path=snapshot_path, single_file=single_file,
+                                           dedup=dedup, inline_codes=inline_codes, checkpoint=checkpoint)
+        else:
+            snapshot_path = None
+            if delta:
+                snapshot_file = request.files.get('delta_snapshot')
+                if not snapshot_file or not snapshot_file.filename:
+                    raise ValueError("❌ Delta postprocessing needs the snapshot.json written by delta preprocessing")
+                snapshot_path = os.path.join(job_dir, 'snapshot.json')
+                save_upload(snapshot_file, snapshot_path)
+            errors = run_tep_postprocessing(input_dir, output_dir, base_dir=extract_base_zip(job_dir),
+                                            qa_rows=qa_rows, checkpoint=checkpoint, snapshot_path=snapshot_path)
+    else:
+        if process_type == 'preprocess':
+            errors = run_legacy_preprocessing(input_dir, output_dir, version=xliff_version,
+                                              single_file=single_file, dedup=dedup,
+                                              inline_codes=inline_codes, checkpoint=checkpoint)
+        else:
+            run_legacy_postprocessing(input_dir, output_dir, base_dir=extract_base_zip(job_dir),
+                                      qa_rows=qa_rows, checkpoint=checkpoint)
+            errors = []
+
+    prune_outputs()
+    job_id = uuid.uuid4().hex
+    public_dir = os.path.join(TEMP_OUTPUT, job_id)
+    shutil.copytree(output_dir, public_dir)
+
+    zip_path = os.path.join(public_dir, "batch.zip")
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for root, _, files in os.walk(public_dir):
+            for file in files:
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, public_dir)
+                if not arcname.endswith("batch.zip"):
+                    zipf.write(file_path, arcname)
+
+    output_files = []
+    for root, _, files in os.walk(public_dir):
+        for file in files:
+            rel_path = os.path.relpath(os.path.join(root, file), public_dir)
+            if not rel_path.endswith("batch.zip"):
+                output_files.append(rel_path.replace("\\", "/"))
+
+    qa = None
+    if qa_rows:
+        _, token, report_name = save_report(qa_rows, prefix="QA_Report")
+        qa = {
+            "issues": sum(1 for r in qa_rows if r["Issue Type"] != "No issues found"),
+            "files": len({(r["Language"], r["File Name"]) for r in qa_rows}),
+            "report_url": f"/temp_download/{token}",
+            "summary_url": f"/compare/{token}",
+            "rows_url": f"/api/compare/{token}/rows",
+            "report_name": report_name,
+        }
+
+    finish_job(job_dir)  # on failure the job dir is kept, so resubmitting resumes the run
+    return job_id, output_files, errors, qa
+
+@app.route('/process', methods=['POST'])
+def process():
+    try:
+        job_id, output_files, errors, qa = run_process()
+        return render_template("results.html", job_id=job_id, files=output_files, errors=errors, qa=qa)
+
+    except Exception as e:
+        return render_template("error.html", message=str(e))
+
+@app.route('/download/<job_id>/<path:filename>')
+def download(job_id, filename):
+    file_path = safe_join(TEMP_OUTPUT, job_id, filename)
+    if file_path and os.path.isfile(file_path):
+        return send_file(os.path.abspath(file_path), as_attachment=True)
     return "File not found", 404
 
+# ---------- JSON API: same work as the HTML routes, structured results ----------
+
+def wants_stream():
+    flag = request.args.get('stream') or request.form.get('stream')
+    return flag in ('1', 'true', 'on') or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def ndjson(records):
+    """Streams records as newline-delimited JSON, one line per record."""
+    return Response((json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records),
+                    mimetype='application/x-ndjson')
+
+def api_error(e):
+    """
+    JSON error response: the code of werkzeug's HTTP errors (e.g. 413 for too many form
+    parts or an over-cap body), 413 for oversized ZIPs, 400 for bad uploads or options
+    (the pipelines raise ValueError for those), 500 for failures on the server's side.
+    """
+    if isinstance(e, HTTPException):
+        status = e.code
+    elif isinstance(e, UploadTooLarge):
+        status = 413
+    elif isinstance(e, (ValueError, zipfile.BadZipFile)):
+        status = 400
+    else:
+        status = 500
+        app.logger.exception("❌ %s failed", request.path)
+    return jsonify(status="error", message=str(e)), status
+
+def public_group(group):
+    return {col: group[col] for col in SUMMARY_COLUMNS}
+
+@app.route('/api/process', methods=['POST'])
+def api_process():
+    try:
+        job_id, output_files, errors, qa = run_process()
+    except Exception as e:
+        return api_error(e)
+
+    return jsonify(
+        status="done",
+        job_id=job_id,
+        files=[{"path": f, "url": url_for('download', job_id=job_id, filename=f)} for f in output_files],
+        batch_url=url_for('download', job_id=job_id, filename='batch.zip'),
+        errors=errors,
+        qa=qa,
+    )
+
+@app.route('/api/final_compare', methods=['POST'])
+def api_final_compare():
+    """
+    Returns the aggregated issue summary as JSON. With stream=1 (or Accept:
+    application/x-ndjson) the report header and each group are streamed as NDJSON
+    lines, followed by every issue row when rows=1.
+    """
+    source_files = request.files.getlist('source_files')
+    translated_zip = request.files.get('translated_zip')
+    if not source_files or not translated_zip:
+        return jsonify(status="error", message="Missing source files or translated ZIP"), 400
+
+    try:
+        token, report_name, report_data, summary = compare_uploads(
+            source_files, translated_zip, backend=request.form.get('backend') or None)
+    except Exception as e:
+        return api_error(e)
+
+    report = {
+        "status": "done",
+        "token": token,
+        "report_name": report_name,
+        "report_url": url_for('temp_download', token=token),
+        "rows_url": url_for('api_report_rows', token=token),
+        "total": sum(group["Count"] for group in summary),
+        "groups": len(summary),
+    }
+    if not wants_stream():
+        return jsonify(summary=[public_group(g) for g in summary], **report)
+
+    include_rows = (request.args.get('rows') or request.form.get('rows')) in ('1', 'true', 'on')
+
+    def records():
+        yield {"type": "report", **report}
+        for group in summary:
+            yield {"type": "group", **public_group(group)}
+        if include_rows:
+            for row in report_data:
+                yield {"type": "row", **row}
+
+    return ndjson(records())
+
+@app.route('/api/compare/<token>/rows')
+def api_report_rows(token):
+    """Streams the stored issue rows of a report (optionally one summary group) as NDJSON."""
+    report_data = load_report_rows(token)
+    if report_data is None:
+        return jsonify(status="error", message="Report not found"), 404
+
+    index = request.args.get('group', type=int)
+    if index is not None:
+        summary = aggregate_issues(report_data)
+        if not 0 <= index < len(summary):
+            return jsonify(status="error", message="Group not found"), 404
+        report_data = [report_data[i] for i in summary[index]["Rows"]]
+    return ndjson(report_data)
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
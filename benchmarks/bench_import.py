@@ -0,0 +1,51 @@
+"""
+Cold-start benchmark: times `import app` in fresh interpreters and reports which heavy
+dependencies got loaded at import time.
+
+    python benchmarks/bench_import.py [--runs 7]
+
+The "eager" line imports pandas and langcodes up front, reproducing the old startup
+cost, so the two lines can be compared on the same machine.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pandas", "numpy", "langcodes", "xlsxwriter", "openpyxl"]
+
+SCENARIOS = {
+    "lazy (current app)": "import app",
+    "eager (pandas + langcodes up front)": "import pandas, langcodes, app",
+}
+
+def time_import(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def loaded_heavy_modules(code):
+    probe = f"{code}; import sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", probe], cwd=REPO_ROOT, check=True,
+                         capture_output=True, text=True).stdout.strip()
+    return out or "-"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<40} {'median':>9} {'min':>9}  heavy modules loaded")
+    for name, code in SCENARIOS.items():
+        timings = time_import(code, args.runs)
+        print(f"{name:<40} {statistics.median(timings) * 1000:>7.0f}ms {min(timings) * 1000:>7.0f}ms  "
+              f"{loaded_heavy_modules(code)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Reader benchmark: times the whole-file pattern readers against the previous
+line-by-line text readers on generated bundles, and checks both return the same data.
+
+    python benchmarks/bench_readers.py [--mb 64] [--runs 3]
+
+"broken json" appends a syntax error near the end of the file, so it times the
+recovery path (one read now, three before).
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import bundle_readers
+from final_compare import fix_encoding
+
+# Previous implementations, kept here as the baseline
+def old_read_properties(path):
+    data = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip() and not line.startswith('#') and '=' in line:
+                key, val = line.split('=', 1)
+                data[key.strip()] = val.strip()
+    return data
+
+def old_read_json_raw(path):
+    raw_lines = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = re.match(r'\s*"([^"]+)"\s*:\s*"((?:[^"\\]|\\.)*)"\s*,?\s*$', line)
+            if match:
+                key, val = match.groups()
+                raw_lines[key] = val
+    return raw_lines
+
+def old_load_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f), None
+    except json.JSONDecodeError as e:
+        bad_key = ""
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+            if e.lineno - 1 < len(lines):
+                key_match = re.search(r'"([^"]+)"\s*:', lines[e.lineno - 1].strip())
+                if key_match:
+                    bad_key = key_match.group(1)
+        with open(path, 'r', encoding='utf-8') as f:
+            matches = re.findall(r'"([^"]+)"\s*:\s*"((?:[^"\\]|\\.)*)"', f.read())
+        return {k: fix_encoding(v) for k, v in matches}, f"{bad_key} - JSON error at line {e.lineno}, column {e.colno}: {e}"
+
+def make_bundles(directory, size_mb):
+    value = "Save the {count} items to “Documents” – ça marche. "
+    count = size_mb * 1024 * 1024 // (len(value.encode('utf-8')) + 24)
+    props = os.path.join(directory, "big.properties")
+    with open(props, 'w', encoding='utf-8') as f:
+        f.write("# generated\n")
+        for i in range(count):
+            f.write(f"section.key_{i} = {value}{i}\n")
+
+    data = os.path.join(directory, "big.json")
+    with open(data, 'w', encoding='utf-8') as f:
+        f.write("{\n")
+        f.write(",\n".join(f'  "section.key_{i}": "{value}{i}"' for i in range(count)))
+        f.write("\n}\n")
+
+    broken = os.path.join(directory, "broken.json")
+    with open(data, 'r', encoding='utf-8') as src, open(broken, 'w', encoding='utf-8') as dst:
+        text = src.read()
+        dst.write(text[:-3] + '\n  "missing_comma": "x"\n  "tail": "y"\n}\n')
+    return props, data, broken
+
+def best_of(func, path, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=64, help="approximate size of each generated bundle")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        props, data, broken = make_bundles(directory, args.mb)
+        cases = [
+            ("properties", props, old_read_properties, bundle_readers.read_properties),
+            ("json (line pairs)", data, old_read_json_raw, bundle_readers.read_json_lines),
+            ("json", data, old_load_json, lambda p: bundle_readers.load_json(p, convert=fix_encoding)),
+            ("broken json", broken, old_load_json, lambda p: bundle_readers.load_json(p, convert=fix_encoding)),
+        ]
+        print(f"{'case':<20}{'MB':>6}{'old s':>9}{'new s':>9}{'speedup':>9}  same")
+        for name, path, old, new in cases:
+            size = os.path.getsize(path) / (1024 * 1024)
+            old_time, old_result = best_of(old, path, args.runs)
+            new_time, new_result = best_of(new, path, args.runs)
+            print(f"{name:<20}{size:>6.0f}{old_time:>9.2f}{new_time:>9.2f}{old_time / new_time:>8.1f}x  {old_result == new_result}")
+
+if __name__ == "__main__":
+    main()
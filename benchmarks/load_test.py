@@ -0,0 +1,275 @@
+"""
+Load test for the upload endpoints. Generates realistic bundle corpora, replays them
+as multipart uploads to /process and /final_compare at increasing concurrency, and
+reports latency percentiles, throughput and error rate per endpoint.
+
+Against a running server:
+
+    gunicorn -c gunicorn.conf.py app:app
+    python benchmarks/load_test.py --url http://localhost:10000
+
+In-process, through Flask's test client (no server, no network; suitable for CI):
+
+    python benchmarks/load_test.py --local --requests 8 --concurrency 1,4 --max-error-rate 0
+
+Every upload carries distinct content, so none is answered from the report cache or an
+earlier job; pass --repeat to replay one corpus and measure cached responses instead.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LANGUAGES = ["fr", "de", "ta", "ja"]
+# Marker of templates/error.html: the HTML routes report failures with status 200
+ERROR_PAGE_MARKER = "Something went wrong".encode('utf-8')
+
+PHRASES = [
+    "Save {count} items to Documents", "Welcome back, {name}!", "Open the <b>Settings</b> page",
+    "Your trial ends in {{days}} days.", "Upload failed: %s", "Delete {{count}} files?",
+    "Sign in with SSO", "Export as PDF or CSV", "Last synced {time} ago.", "Tap here to continue",
+]
+
+# ---------- corpus ----------
+
+def make_corpus(keys, languages=LANGUAGES, seed=None):
+    """
+    One product's bundles: a JSON and a .properties source, and per language their
+    translations with the defects real vendor drops have (missing keys, dropped
+    placeholders, untranslated strings). Returns {"sources": {name: bytes},
+    "targets": {lang: {name: bytes}}}.
+    """
+    rng = random.Random(seed)
+    nonce = uuid.uuid4().hex[:8]
+    json_source = {f"screen{i // 50}.key_{i}": f"{rng.choice(PHRASES)} ({nonce}-{i})" for i in range(keys)}
+    props_source = {f"menu.item_{i}": f"{rng.choice(PHRASES)} ({nonce}-{i})" for i in range(keys // 4)}
+
+    targets = {}
+    for lang in languages:
+        targets[lang] = {
+            "messages.json": dump_json(translate(json_source, lang, rng)),
+            "labels.properties": dump_properties(translate(props_source, lang, rng)),
+        }
+    return {
+        "sources": {"messages.json": dump_json(json_source), "labels.properties": dump_properties(props_source)},
+        "targets": targets,
+    }
+
+def translate(source, lang, rng):
+    target = {}
+    for key, text in source.items():
+        roll = rng.random()
+        if roll < 0.02:
+            continue  # missing key
+        if roll < 0.04:
+            target[key] = text  # left untranslated
+        elif roll < 0.06:
+            target[key] = f"[{lang}] " + text.replace("{count}", "").replace("{{days}}", "")
+        else:
+            target[key] = f"[{lang}] {text}"
+    return target
+
+def dump_json(data):
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+def dump_properties(data):
+    return "".join(f"{key}={value}\n" for key, value in data.items()).encode('utf-8')
+
+def zip_targets(targets, suffix=True):
+    """Language folders at the root of the zip; `suffix` names files messages_fr.json etc."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for lang, files in targets.items():
+            for name, content in files.items():
+                if suffix:
+                    base, ext = os.path.splitext(name)
+                    name = f"{base}_{lang}{ext}"
+                zipf.writestr(f"{lang}/{name}", content)
+    return archive.getvalue()
+
+# ---------- scenarios: (endpoint, form fields, [(field, filename, bytes)]) ----------
+
+def final_compare_upload(corpus):
+    files = [("source_files", name, content) for name, content in corpus["sources"].items()]
+    files.append(("translated_zip", "translations.zip", zip_targets(corpus["targets"])))
+    return "/final_compare", {}, files
+
+def process_tep_upload(corpus):
+    files = [("files", name, content) for name, content in corpus["sources"].items()]
+    return "/process", {"workflow": "tep", "processType": "preprocess", "xliff_version": "1.2"}, files
+
+def process_legacy_upload(corpus):
+    files = [("source_files", name, content) for name, content in corpus["sources"].items()]
+    files.append(("target_zip", "targets.zip", zip_targets(corpus["targets"], suffix=False)))
+    return "/process", {"workflow": "legacy", "processType": "preprocess", "xliff_version": "1.2"}, files
+
+SCENARIOS = {
+    "final_compare": final_compare_upload,
+    "process:tep": process_tep_upload,
+    "process:legacy": process_legacy_upload,
+}
+
+# ---------- clients ----------
+
+class HttpClient:
+    """Posts to a running server with urllib."""
+
+    def __init__(self, base_url, timeout=600):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def post(self, path, fields, files):
+        body, content_type = encode_multipart(fields, files)
+        req = urllib.request.Request(self.base_url + path, data=body,
+                                     headers={"Content-Type": content_type}, method="POST")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+class LocalClient:
+    """Calls the app in-process through Flask's test client, one client per thread."""
+
+    def __init__(self):
+        sys.path.insert(0, REPO_ROOT)
+        os.chdir(REPO_ROOT)  # the app resolves static/ and tmp/ relative to the working dir
+        from app import app
+        self.app = app
+        self.local = threading.local()
+
+    def post(self, path, fields, files):
+        if not hasattr(self.local, "client"):
+            self.local.client = self.app.test_client()
+        data = dict(fields)
+        for field, filename, content in files:
+            data.setdefault(field, []).append((io.BytesIO(content), filename))
+        resp = self.local.client.post(path, data=data, content_type="multipart/form-data")
+        return resp.status_code, resp.get_data()
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+    for field, filename, content in files:
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                   f'filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode('utf-8'))
+        body.write(content)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode('utf-8'))
+    return body.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+# ---------- run and report ----------
+
+def is_error(status, body, api):
+    if status >= 400:
+        return True
+    if api:
+        try:
+            return json.loads(body).get("status") != "done"
+        except ValueError:
+            return True
+    return ERROR_PAGE_MARKER in body
+
+def timed_post(client, upload, api):
+    """(latency, failed, server_error); a server error is a 5xx or no response at all."""
+    path, fields, files = upload
+    start = time.perf_counter()
+    try:
+        status, body = client.post("/api" + path if api else path, fields, files)
+        failed = is_error(status, body, api)
+        server_error = status >= 500
+    except Exception:  # connection refused, timeout, ...
+        failed = server_error = True
+    return time.perf_counter() - start, failed, server_error
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+def run_level(client, uploads, concurrency, api):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda upload: timed_post(client, upload, api), uploads))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _, _ in results)
+    errors = sum(1 for _, failed, _ in results if failed)
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "server_errors": sum(1 for _, _, server_error in results if server_error),
+        "error_rate": errors / len(results),
+        "throughput": len(results) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": latencies[-1],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:10000", help="base URL of a running server")
+    target.add_argument("--local", action="store_true", help="call the app in-process instead (no network)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--keys", type=int, default=1000, help="keys per JSON source bundle")
+    parser.add_argument("--requests", type=int, default=16, help="uploads per scenario and concurrency level")
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    parser.add_argument("--api", action="store_true", help="use the /api/ routes (JSON status) instead of the HTML ones")
+    parser.add_argument("--repeat", action="store_true", help="replay one corpus, so repeats hit the caches")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    parser.add_argument("--max-error-rate", type=float, default=None,
+                        help="exit with status 1 if any endpoint's error rate exceeds this (e.g. 0 in CI)")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(',')]
+    client = LocalClient() if args.local else HttpClient(args.url)
+
+    shared = make_corpus(args.keys, seed=args.seed) if args.repeat else None
+    results = []
+    print(f"{'endpoint':<16}{'conc':>5}{'req':>6}{'req/s':>8}{'p50 s':>8}{'p90 s':>8}"
+          f"{'p95 s':>8}{'p99 s':>8}{'max s':>8}{'errors':>8}{'5xx':>6}")
+    for name in scenarios:
+        for concurrency in levels:
+            uploads = [SCENARIOS[name](shared or make_corpus(args.keys, seed=args.seed))
+                       for _ in range(args.requests)]
+            stats = run_level(client, uploads, concurrency, args.api)
+            results.append({"endpoint": name, "concurrency": concurrency, **stats})
+            print(f"{name:<16}{concurrency:>5}{stats['requests']:>6}{stats['throughput']:>8.2f}"
+                  f"{stats['p50']:>8.2f}{stats['p90']:>8.2f}{stats['p95']:>8.2f}{stats['p99']:>8.2f}"
+                  f"{stats['max']:>8.2f}{stats['error_rate']:>7.0%}{stats['server_errors']:>6}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"mode": "local" if args.local else args.url, "keys": args.keys, "results": results}, f, indent=2)
+
+    if args.max_error_rate is not None:
+        worst = max(results, key=lambda r: r["error_rate"], default=None)
+        if worst and worst["error_rate"] > args.max_error_rate:
+            print(f"❌ {worst['endpoint']} error rate {worst['error_rate']:.1%} exceeds {args.max_error_rate:.1%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import re
+
+JSON_ENTRY = re.compile(r'^(\s*)"([^"]+)"(\s*:\s*")((?:[^"\\]|\\.)*)("\s*,?\s*)$')
+
+def find_base_bundle(base_dir, lang_code, file_name):
+    """Looks for a previously delivered bundle as <lang>/<file> or flat <file>."""
+    for candidate in (os.path.join(base_dir, lang_code, file_name), os.path.join(base_dir, file_name)):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+def _split_eol(line):
+    body = line.rstrip('\r\n')
+    return body, line[len(body):]
+
+def merge_json_bundle(base_path, translations, output_path, escape=lambda v: v):
+    """
+    Streams `base_path` into `output_path`, replacing the values of keys present in
+    `translations` in place. Keys the base does not have are appended before the final
+    closing brace. Only the last few lines are ever held in memory.
+    """
+    pending = dict(translations)
+    indent = None
+    buffered = []  # lines since the last real entry; the final "}" lives here
+
+    with open(base_path, 'r', encoding='utf-8', newline='') as src, \
+            open(output_path, 'w', encoding='utf-8', newline='') as out:
+        for line in src:
+            body, eol = _split_eol(line)
+            match = JSON_ENTRY.match(body)
+            if match:
+                lead, key, sep, value, tail = match.groups()
+                if indent is None:
+                    indent = lead
+                if key in pending:
+                    line = f'{lead}"{key}"{sep}{escape(pending.pop(key))}{tail}{eol}'
+
+            if body.strip() in ('', '}'):
+                buffered.append(line)
+                continue
+
+            out.writelines(buffered)
+            buffered = [line]
+
+        if pending:
+            close_idx = max((i for i, l in enumerate(buffered) if l.strip() == '}'), default=None)
+            if close_idx is None:
+                raise ValueError(f"❌ Cannot merge into {os.path.basename(base_path)}: closing brace not on its own line")
+
+            head, closing = buffered[:close_idx], buffered[close_idx:]
+            eol = _split_eol(closing[0])[1] or '\n'
+            for i in range(len(head) - 1, -1, -1):
+                body, line_eol = _split_eol(head[i])
+                if body.strip():
+                    if not body.rstrip().endswith((',', '{')):
+                        head[i] = body.rstrip() + ',' + line_eol
+                    break
+
+            indent = indent if indent is not None else '    '
+            keys = list(pending)
+            out.writelines(head)
+            for i, key in enumerate(keys):
+                comma = ',' if i < len(keys) - 1 else ''
+                out.write(f'{indent}"{key}": "{escape(pending[key])}"{comma}{eol}')
+            out.writelines(closing)
+        else:
+            out.writelines(buffered)
+
+def merge_properties_bundle(base_path, translations, output_path, escape=lambda v: v):
+    """Streams a .properties bundle, patching values in place and appending new keys."""
+    pending = dict(translations)
+    eol = '\n'
+
+    with open(base_path, 'r', encoding='utf-8', newline='') as src, \
+            open(output_path, 'w', encoding='utf-8', newline='') as out:
+        last_line = ''
+        for line in src:
+            body, line_eol = _split_eol(line)
+            if line_eol:
+                eol = line_eol
+            if body.strip() and not body.startswith('#') and '=' in body:
+                k, v = body.split('=', 1)
+                key = k.strip()
+                if key in pending:
+                    lead = v[:len(v) - len(v.lstrip())]
+                    line = f"{k}={lead}{escape(pending.pop(key))}{line_eol}"
+            out.write(line)
+            last_line = line
+
+        if pending and last_line and not last_line.endswith(('\n', '\r')):
+            out.write(eol)
+        for key, value in pending.items():
+            out.write(f"{key}={escape(value)}{eol}")
@@ -0,0 +1,66 @@
+import os
+import re
+import json
+import mmap
+from contextlib import contextmanager
+
+# Whole-file patterns anchored per line (MULTILINE, no match crosses a newline), so
+# they find exactly what the old line-by-line readers found, in one pass over the text.
+PROPERTIES_PAIR = re.compile(r'^(?!#)([^=\n]*)=(.*)', re.MULTILINE)
+JSON_LINE_PAIR = re.compile(
+    r'^[^\S\n]*"([^"\n]+)"[^\S\n]*:[^\S\n]*"([^"\\\n]*(?:\\.[^"\\\n]*)*)"[^\S\n]*,?[^\S\n]*$', re.MULTILINE)
+JSON_STRING_PAIR = re.compile(r'"([^"]+)"\s*:\s*"([^"\\]*(?:\\.[^"\\]*)*)"')
+JSON_KEY = re.compile(r'"([^"]+)"\s*:')
+
+@contextmanager
+def mapped(path):
+    """
+    Maps a file read-only, for binary formats read by offset (gettext MO); an empty
+    file yields b'' since mmap cannot map zero bytes.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+def read_text(path):
+    """
+    Reads a whole file as text. The patterns above need the decoded text anyway, so a
+    mapping would save nothing here; the gain over the old readers is the single pass.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def read_properties(path):
+    """key=value lines, skipping blank and '#' lines; keys and values are stripped."""
+    return {m[1].strip(): m[2].strip() for m in PROPERTIES_PAIR.finditer(read_text(path))}
+
+def read_json_lines(path):
+    """One-pair-per-line JSON bundles; values are kept raw (escapes untouched)."""
+    return dict(JSON_LINE_PAIR.findall(read_text(path)))
+
+def load_json(path, convert=None):
+    """
+    Parses a JSON bundle from a single read of the file. Returns (data, error): on a
+    syntax error the string pairs are recovered from the same text and the error
+    names the key on the offending line. `convert` is applied to recovered values.
+    """
+    text = read_text(path)
+    try:
+        return json.loads(text), None
+    except json.JSONDecodeError as e:
+        explanation = str(e)
+        line_info = f"line {e.lineno}, column {e.colno}"
+        start = text.rfind('\n', 0, e.pos) + 1
+        end = text.find('\n', e.pos)
+        key_match = JSON_KEY.search(text[start:end if end != -1 else len(text)].strip())
+        bad_key = key_match.group(1) if key_match else ""
+
+        try:
+            pairs = JSON_STRING_PAIR.findall(text)
+            recovered = {key: convert(value) for key, value in pairs} if convert else dict(pairs)
+            return recovered, f"{bad_key} - JSON error at {line_info}: {explanation}"
+        except Exception as inner:
+            return None, f"Unrecoverable JSON error at {line_info}: {explanation} / {inner}"
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from uploads import CHUNK_SIZE, upload_stream
+from xliff_io import keymap_path
+
+# Jobs live here until they finish, so a run killed midway can be resumed
+CHECKPOINT_ROOT = os.environ.get("CHECKPOINT_DIR", os.path.join(tempfile.gettempdir(), "l10n_jobs"))
+# Unfinished jobs older than this are removed when a new job starts
+CHECKPOINT_TTL = int(os.environ.get("CHECKPOINT_TTL_HOURS", "24")) * 3600
+
+MANIFEST_NAME = "manifest.json"
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def tree_digest(root):
+    """Digest of every file under `root` (relative paths and content)."""
+    h = hashlib.sha256()
+    for path in list_files(root):
+        h.update(os.path.relpath(path, root).encode('utf-8') + b'\0')
+        h.update(file_digest(path).encode('ascii'))
+    return h.hexdigest()
+
+def list_files(root):
+    paths = []
+    for dirpath, dirs, files in os.walk(root):
+        dirs.sort()
+        paths.extend(os.path.join(dirpath, name) for name in sorted(files))
+    return paths
+
+def xliff_digest(xliff_path):
+    """Digest of an XLIFF plus its .keymap.json sidecar, if any."""
+    sidecar = keymap_path(xliff_path)
+    digest = file_digest(xliff_path)
+    return digest + file_digest(sidecar) if os.path.exists(sidecar) else digest
+
+def upload_digest(files, options=()):
+    """Digest of the uploaded files (names and content) and the run options."""
+    h = hashlib.sha256()
+    for option in options:
+        h.update(repr(option).encode('utf-8') + b'\0')
+    for file in files:
+        if not file or not file.filename:
+            continue
+        h.update(f"{file.name}:{file.filename}".encode('utf-8') + b'\0')
+        stream = upload_stream(file)
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+        stream.seek(0)
+    return h.hexdigest()
+
+def prune_jobs(root=CHECKPOINT_ROOT, ttl=CHECKPOINT_TTL):
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - ttl
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.getmtime(path) >= cutoff:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)  # lock file of a long-finished job
+        except OSError:
+            pass  # removed by another worker meanwhile
+
+def open_job(digest, root=CHECKPOINT_ROOT):
+    """Returns the job directory for an input digest; a rerun of the same inputs gets the same one."""
+    prune_jobs(root)
+    job_dir = os.path.join(root, digest[:32])
+    os.makedirs(job_dir, exist_ok=True)
+    os.utime(job_dir)
+    return job_dir
+
+@contextmanager
+def job_lock(job_dir):
+    """
+    Serialises runs of the same job across threads and worker processes. The lock
+    file sits next to the job dir so it outlives finish_job. No-op without fcntl.
+    """
+    try:
+        import fcntl
+    except ImportError:  # Windows dev servers run a single process
+        yield
+        return
+    with open(job_dir + ".lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def finish_job(job_dir):
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+class Checkpoint:
+    """
+    Manifest of completed units (a file, or a file/language pair) of one job.
+    Each entry records the digest of the unit's input and of every output it wrote,
+    so a rerun skips a unit only if its input is unchanged and its outputs are intact.
+    A unit may also keep a JSON result (errors, report rows, file list) for reruns.
+    """
+
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.path = os.path.join(job_dir, MANIFEST_NAME)
+        self.units = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.units = json.load(f)
+            except ValueError:
+                self.units = {}  # torn write: start over
+
+    def _result_path(self, unit):
+        name = hashlib.sha1(unit.encode('utf-8')).hexdigest()
+        return os.path.join(self.job_dir, "results", f"{name}.json")
+
+    def is_done(self, unit, input_hash):
+        entry = self.units.get(unit)
+        if not entry or entry["input"] != input_hash:
+            return False
+        for rel_path, digest in entry["outputs"].items():
+            path = os.path.join(self.job_dir, rel_path)
+            if not os.path.exists(path) or file_digest(path) != digest:
+                return False
+        return not entry["result"] or os.path.exists(self._result_path(unit))
+
+    def result(self, unit):
+        if not self.units.get(unit, {}).get("result"):
+            return None
+        with open(self._result_path(unit), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def complete(self, unit, input_hash, outputs=(), result=None):
+        """Records a finished unit; `outputs` are the paths of the files it wrote."""
+        if result is not None:
+            result_path = self._result_path(unit)
+            os.makedirs(os.path.dirname(result_path), exist_ok=True)
+            with open(result_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, default=str)
+        self.units[unit] = {
+            "input": input_hash,
+            "outputs": {os.path.relpath(p, self.job_dir): file_digest(p) for p in outputs},
+            "result": result is not None,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.units, f, indent=1)
+        os.replace(tmp_path, self.path)
@@ -2,45 +2,47 @@ import os
 import json
 import re
 import tempfile
-import pandas as pd
-import zipfile
 import uuid
+from collections import namedtuple
 from datetime import datetime
 from difflib import SequenceMatcher
-
-LANGUAGE_NAMES = set()  # Now dynamically filled from filenames
-
-PLACEHOLDER_PATTERN = re.compile(
-    r'\?"\{[^{}]+\}\?"|'
-    r'\{\d+\}|'
-    r'\{\{.*?\}\}|'
-    r'\{[^{}]+\}|'
-    r'<[^>]+>|'
-    r'%\w+|'
-    r'\$\w+'
-)
-
-SPACING_RULES = [
-    (re.compile(r'[\u0B80-\u0BFF][{]{2}'), "Missing space before placeholder"),
-    (re.compile(r'[}]{2}[\u0B80-\u0BFF]'), "Missing space after placeholder"),
-    (re.compile(r'[.!?:][^\s{<]'), "Missing space after punctuation"),
-    (re.compile(r'}}[^\s{<]'), "Missing space after closing tag"),
-    (re.compile(r'\d[\u0B80-\u0BFF\w]'), "Missing space between number and word")
-]
-
-def extract_language_from_filename(name):
-    parts = re.split(r'[-_]', os.path.splitext(name)[0])
-    if parts:
-        last_part = parts[-1].lower()
-        if re.match(r'^[a-z]{2,3}(-[A-Z]{2})?$', last_part) or last_part.isalpha():
-            LANGUAGE_NAMES.add(last_part)
-            return last_part
-    return "unknown"
-
-def clean_filename_for_match(name):
+import report_cache
+from checkpoints import Checkpoint, file_digest, finish_job, job_lock, open_job, upload_digest
+from formats import get_format
+from key_alignment import align_keys
+from language_meta import language_from_filename
+from placeholders import PLACEHOLDER_PATTERN
+from rule_profiles import get_rule_set, rules_version
+from uploads import extract_zip_upload, save_upload
+
+TAG_PATTERN = re.compile(r'</?([a-zA-Z][a-zA-Z0-9]*)[^>]*?>')
+ACRONYM_PATTERN = re.compile(r'\b[A-Z]{2,}\b')
+DOUBLE_SPACE_PATTERN = re.compile(r'\s{2,}')
+
+class LanguageContext:
+    """
+    Language tokens seen while matching filenames during a single comparison run.
+    Each run creates its own, so concurrent requests never see each other's uploads
+    and nothing accumulates at module level.
+    """
+
+    def __init__(self):
+        self.names = set()
+
+    def add(self, lang):
+        if lang != "unknown":
+            self.names.add(lang)
+        return lang
+
+def extract_language_from_filename(name, context=None):
+    lang = language_from_filename(name)
+    return context.add(lang) if context is not None else lang
+
+def clean_filename_for_match(name, context=None):
+    known_languages = context.names if context is not None else ()
     base = os.path.splitext(name)[0]
     parts = re.split(r'[-_]', base)
-    if parts and parts[-1].lower() in LANGUAGE_NAMES:
+    if parts and parts[-1].lower() in known_languages:
         parts.pop()
     elif re.match(r'^[a-z]{2,3}(-[A-Z]{2})?$', parts[-1], re.IGNORECASE):
         parts.pop()
@@ -54,52 +56,106 @@ def fix_encoding(s):
     except:
         return s
 
-def load_properties_from_path(file_path):
-    props = {}
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip() and '=' in line and not line.startswith('#'):
-                    key, val = line.split('=', 1)
-                    props[key.strip()] = fix_encoding(val.strip())
-        return props, None
-    except Exception as e:
-        return None, str(e)
-
-def load_json_from_path(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f), None
-    except json.JSONDecodeError as e:
-        explanation = str(e)
-        line_info = f"line {e.lineno}, column {e.colno}"
-        bad_key = ""
-
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                if e.lineno - 1 < len(lines):
-                    broken_line = lines[e.lineno - 1].strip()
-                    key_match = re.search(r'"([^"]+)"\s*:', broken_line)
-                    if key_match:
-                        bad_key = key_match.group(1)
-        except:
-            pass
-
-        recovered = {}
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                raw_text = f.read()
-                matches = re.findall(r'"([^"]+)"\s*:\s*"((?:[^"\\]|\\.)*)"', raw_text)
-                for k, v in matches:
-                    recovered[k] = fix_encoding(v)
-            return recovered, f"{bad_key} - JSON error at {line_info}: {explanation}"
-        except Exception as inner:
-            return None, f"Unrecoverable JSON error at {line_info}: {explanation} / {inner}"
-
-def check_spacing_mismatches(src_str, tgt_str):
+def load_bundle_from_path(file_path):
+    """Returns (data, error) for any registered bundle format."""
+    bundle_format = get_format(file_path)
+    if bundle_format is None:
+        return None, f"Unsupported file type: {os.path.splitext(file_path)[1].lower()}"
+    return bundle_format.load(file_path, convert=fix_encoding)
+
+# "python" runs compare_files row by row; "pandas" uses the vectorized batch backend
+COMPARE_BACKEND = os.environ.get("COMPARE_BACKEND", "python")
+
+REPORT_COLUMNS = ["File Name", "Language", "Issue Type", "Key", "Source", "Target", "Details"]
+SUMMARY_COLUMNS = ["Issue Type", "Details", "Source", "Count", "Languages", "Files", "Sample Keys"]
+SAMPLE_KEYS = 5
+
+def aggregate_issues(rows, sample_size=SAMPLE_KEYS):
+    """
+    Groups identical (issue type, details, source) findings across keys, files and
+    languages, largest group first. Each group keeps the indexes of its rows in
+    `rows` under "Rows" for drill-down.
+    """
+    groups = {}
+    for i, row in enumerate(rows):
+        issue_type = row.get("Issue Type", "")
+        if issue_type == "No issues found":
+            continue
+        group_key = (issue_type, row.get("Details", ""), str(row.get("Source", "")))
+        group = groups.get(group_key)
+        if group is None:
+            group = groups[group_key] = {"languages": {}, "files": {}, "keys": {}, "rows": []}
+        group["languages"][row.get("Language", "")] = None
+        group["files"][row.get("File Name", "")] = None
+        if len(group["keys"]) < sample_size:
+            group["keys"][row.get("Key", "")] = None
+        group["rows"].append(i)
+
+    summary = []
+    for (issue_type, details, source), group in groups.items():
+        summary.append({
+            "Issue Type": issue_type,
+            "Details": details,
+            "Source": source,
+            "Count": len(group["rows"]),
+            "Languages": ", ".join(lang for lang in group["languages"] if lang),
+            "Files": ", ".join(name for name in group["files"] if name),
+            "Sample Keys": ", ".join(key for key in group["keys"] if key),
+            "Rows": group["rows"],
+        })
+    summary.sort(key=lambda g: g["Count"], reverse=True)
+    return summary
+
+def _write_sheet(workbook, name, columns, rows, header_format, wrap_format):
+    worksheet = workbook.add_worksheet(name)
+    widths = [len(col) for col in columns]
+    for c, col in enumerate(columns):
+        worksheet.write_string(0, c, col, header_format)
+    for r, row in enumerate(rows, start=1):
+        for c, col in enumerate(columns):
+            value = row.get(col, "")
+            worksheet.write(r, c, value if isinstance(value, (int, float)) else str(value))
+            widths[c] = max(widths[c], len(str(value)))
+
+    for c, width in enumerate(widths):
+        worksheet.set_column(c, c, width + 5, wrap_format)
+
+def write_report(rows, output_path, summary=None):
+    """
+    Writes the Excel report (xlsxwriter, no pandas): a Summary sheet of aggregated
+    issues followed by the per-key Report sheet.
+    """
+    import xlsxwriter  # only needed when a report is actually produced
+
+    if summary is None:
+        summary = aggregate_issues(rows)
+
+    workbook = xlsxwriter.Workbook(output_path)
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    wrap_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+    _write_sheet(workbook, 'Summary', SUMMARY_COLUMNS, summary, header_format, wrap_format)
+    _write_sheet(workbook, 'Report', REPORT_COLUMNS, rows, header_format, wrap_format)
+    workbook.close()
+
+# Source-side facts every check needs; identical for all target languages
+SourceAnalysis = namedtuple('SourceAnalysis', ['placeholders', 'placeholder_set', 'tags', 'acronyms', 'length'])
+
+def analyze_source_value(src_str):
+    placeholders = PLACEHOLDER_PATTERN.findall(src_str)
+    return SourceAnalysis(
+        placeholders=placeholders,
+        placeholder_set=set(placeholders),
+        tags=set(TAG_PATTERN.findall(src_str)),
+        acronyms=ACRONYM_PATTERN.findall(src_str),
+        length=len(src_str),
+    )
+
+def analyze_source(source_data):
+    """Runs the source-side regexes once per bundle so each language comparison reuses them."""
+    return {key: analyze_source_value(str(value)) for key, value in source_data.items()}
+
+def placeholder_spacing_issues(tgt_str, src_placeholders):
     issues = []
-    src_placeholders = PLACEHOLDER_PATTERN.findall(src_str)
     for ph in src_placeholders:
         if ph in tgt_str:
             idx = tgt_str.find(ph)
@@ -107,19 +163,56 @@ def check_spacing_mismatches(src_str, tgt_str):
                 issues.append(("Spacing Mismatch", f"No space before {ph}"))
             if idx + len(ph) < len(tgt_str) and tgt_str[idx + len(ph)].isalnum():
                 issues.append(("Spacing Mismatch", f"No space after {ph}"))
+    return issues
+
+def rows_path(token):
+    return os.path.join(tempfile.gettempdir(), f"{token}__rows.json")
+
+def save_report(rows, prefix="Comparison_Report", summary=None):
+    """
+    Writes the report under a fresh download token, plus the rows as JSON for the
+    drill-down view; returns (path, token, report_name).
+    """
+    token = str(uuid.uuid4())
+    date_str = datetime.now().strftime("%d-%b-%Y")
+    report_name = f"{prefix}_{date_str}.xlsx"
+    output_path = os.path.join(tempfile.gettempdir(), f"{token}__{report_name}")
+
+    write_report(rows, output_path, summary)
+    with open(rows_path(token), 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False, default=str)
+    return output_path, token, report_name
+
+def load_report_rows(token):
+    """Returns the rows stored for a report token, or None if they are gone."""
+    try:
+        with open(rows_path(str(uuid.UUID(token))), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return None
+
+def check_spacing_mismatches(src_str, tgt_str, src_placeholders=None, rule_set=None):
+    if rule_set is None:
+        rule_set = get_rule_set()
+    issues = []
+    if 'placeholder_spacing' in rule_set.checks:
+        if src_placeholders is None:
+            src_placeholders = PLACEHOLDER_PATTERN.findall(src_str)
+        issues = placeholder_spacing_issues(tgt_str, src_placeholders)
 
-    for pattern, label in SPACING_RULES:
+    for pattern, label in rule_set.spacing_rules:
         if pattern.search(tgt_str):
             issues.append(("Spacing Mismatch", label))
 
-    return list(set(issues))
+    return list(dict.fromkeys(issues))
 
-def check_tag_mismatch(src, tgt):
+def check_tag_mismatch(src, tgt, src_tags=None):
     issues = []
-    src_tags = re.findall(r'</?([a-zA-Z][a-zA-Z0-9]*)[^>]*?>', src)
-    tgt_tags = re.findall(r'</?([a-zA-Z][a-zA-Z0-9]*)[^>]*?>', tgt)
-    if set(src_tags) != set(tgt_tags):
-        issues.append(("HTML Tag Mismatch", f"Tag sets differ. Source: {set(src_tags)}, Target: {set(tgt_tags)}"))
+    if src_tags is None:
+        src_tags = set(TAG_PATTERN.findall(src))
+    tgt_tags = set(TAG_PATTERN.findall(tgt))
+    if src_tags != tgt_tags:
+        issues.append(("HTML Tag Mismatch", f"Tag sets differ. Source: {src_tags}, Target: {tgt_tags}"))
     return issues
 
 def check_partial_translation(src, tgt):
@@ -129,19 +222,27 @@ def check_partial_translation(src, tgt):
             return [("Partial Translation", f"Similarity too high ({int(ratio*100)}%) but not identical.")]
     return []
 
-def check_acronym_mismatch(src, tgt):
+def check_acronym_mismatch(src, tgt, acronyms=None):
     issues = []
-    acronyms = re.findall(r'\b[A-Z]{2,}\b', src)
+    if acronyms is None:
+        acronyms = ACRONYM_PATTERN.findall(src)
     for ac in acronyms:
         if ac not in tgt:
             issues.append(("Acronym Mismatch", f"Acronym '{ac}' not found in target."))
     return issues
 
-def compare_files(source_data, translated_data, lang, file_name):
+def compare_files(source_data, translated_data, lang, file_name, source_analysis=None):
+    """
+    Compares one target bundle with its source. Pass `source_analysis` (from
+    analyze_source) when the same source is compared against several languages.
+    Optional checks follow the rule profile of `lang` (see rule_profiles).
+    """
     report_data = []
-    all_keys = set(source_data.keys()).union(translated_data.keys())
+    rules = get_rule_set(lang)
+    checks = rules.checks
+    alignment = align_keys(source_data, translated_data)
 
-    for key in all_keys:
+    for key in alignment.ordered:
         issues = []
         src_val = source_data.get(key, "")
         tgt_val = translated_data.get(key, "")
@@ -155,19 +256,25 @@ def compare_files(source_data, translated_data, lang, file_name):
         else:
             src_str = str(src_val)
             tgt_str = str(tgt_val)
+            analysis = source_analysis.get(key) if source_analysis else None
+            if analysis is None:
+                analysis = analyze_source_value(src_str)
 
             if src_str == tgt_str:
                 issues.append(("Untranslated Key", "Source and target values are identical."))
-            elif set(PLACEHOLDER_PATTERN.findall(src_str)) != set(PLACEHOLDER_PATTERN.findall(tgt_str)):
+            elif analysis.placeholder_set != set(PLACEHOLDER_PATTERN.findall(tgt_str)):
                 issues.append(("Placeholder Mismatch", "Mismatch in placeholder usage."))
             else:
-                issues.extend(check_spacing_mismatches(src_str, tgt_str))
+                issues.extend(check_spacing_mismatches(src_str, tgt_str, analysis.placeholders, rules))
 
-            issues.extend(check_tag_mismatch(src_str, tgt_str))
-            issues.extend(check_partial_translation(src_str, tgt_str))
-            if re.search(r'\s{2,}', tgt_str):
+            if 'tags' in checks:
+                issues.extend(check_tag_mismatch(src_str, tgt_str, analysis.tags))
+            if 'partial_translation' in checks:
+                issues.extend(check_partial_translation(src_str, tgt_str))
+            if 'double_space' in checks and DOUBLE_SPACE_PATTERN.search(tgt_str):
                 issues.append(("Formatting Issue", "Double spaces found in translation."))
-            issues.extend(check_acronym_mismatch(src_str, tgt_str))
+            if 'acronyms' in checks:
+                issues.extend(check_acronym_mismatch(src_str, tgt_str, analysis.acronyms))
 
         for issue_type, detail in issues:
             report_data.append({
@@ -190,30 +297,32 @@ def compare_files(source_data, translated_data, lang, file_name):
 
     return report_data
 
-def run_final_comparison_from_zip(source_files, translated_zip_file):
+def get_compare_backend(name=None):
+    name = name or COMPARE_BACKEND
+    if name == "pandas":
+        from vector_compare import compare_files_vectorized
+        return compare_files_vectorized
+    if name == "python":
+        return compare_files
+    raise ValueError(f"Unknown comparison backend: {name}")
+
+def collect_report_rows(source_files, translated_zip_file, temp_dir, context, compare=compare_files,
+                        checkpoint=None):
     all_report_rows = []
-    temp_dir = tempfile.mkdtemp()
     translated_dir = os.path.join(temp_dir, "translated")
 
     # Extract ZIP
-    with zipfile.ZipFile(translated_zip_file, 'r') as zip_ref:
-        zip_ref.extractall(translated_dir)
+    extract_zip_upload(translated_zip_file, translated_dir)
 
     # Load source files
     source_map = {}
     for src in source_files:
         filename = src.filename
-        ext = os.path.splitext(filename)[1].lower()
         base_name = os.path.splitext(os.path.basename(filename))[0].lower()
         path = os.path.join(temp_dir, filename)
-        src.save(path)
+        save_upload(src, path)
 
-        if ext == '.json':
-            data, err = load_json_from_path(path)
-        elif ext == '.properties':
-            data, err = load_properties_from_path(path)
-        else:
-            data, err = None, f"Unsupported file type: {ext}"
+        data, err = load_bundle_from_path(path)
 
         if err:
             all_report_rows.append({
@@ -225,24 +334,24 @@ def run_final_comparison_from_zip(source_files, translated_zip_file):
             })
             continue
 
-        source_map[base_name] = (filename, data)
+        source_map[base_name] = (filename, data, analyze_source(data))
 
     # Process translated files (flat OR subfolder)
     for root, dirs, files in os.walk(translated_dir):
-        for file in files:
+        dirs.sort()
+        for file in sorted(files):
             tgt_path = os.path.join(root, file)
             rel_path = os.path.relpath(tgt_path, translated_dir)
 
-            ext = os.path.splitext(file)[1].lower()
             tgt_base = os.path.splitext(file)[0].lower()
 
             # Try to get language from subfolder if present
             path_parts = os.path.normpath(rel_path).split(os.sep)
-            lang = path_parts[0] if len(path_parts) > 1 else extract_language_from_filename(file)
+            lang = path_parts[0] if len(path_parts) > 1 else extract_language_from_filename(file, context)
 
             # Try to find matching source by prefix
             matched = False
-            for src_base, (src_filename, source_data) in source_map.items():
+            for src_base, (src_filename, source_data, source_analysis) in source_map.items():
                 if tgt_base.startswith(src_base):
                     matched = True
                     break
@@ -257,15 +366,17 @@ def run_final_comparison_from_zip(source_files, translated_zip_file):
                 })
                 continue
 
-            if ext == '.json':
-                tgt_data, err = load_json_from_path(tgt_path)
-            elif ext == '.properties':
-                tgt_data, err = load_properties_from_path(tgt_path)
-            else:
-                tgt_data, err = None, f"Unsupported file type: {ext}"
+            if checkpoint is not None:
+                input_hash = f"{src_filename}|{file_digest(tgt_path)}"
+                if checkpoint.is_done(rel_path, input_hash):
+                    all_report_rows.extend(checkpoint.result(rel_path))  # ⏭️ compared by an earlier run
+                    continue
+
+            file_rows = []
+            tgt_data, err = load_bundle_from_path(tgt_path)
 
             if err:
-                all_report_rows.append({
+                file_rows.append({
                     "File Name": file,
                     "Language": lang,
                     "Issue Type": "Target Error",
@@ -273,27 +384,63 @@ def run_final_comparison_from_zip(source_files, translated_zip_file):
                     "Source": "", "Target": "", 
                     "Details": err if " - " not in err else err.split(" - ")[1]
                 })
-                if not tgt_data:
-                    continue
-
-            issues = compare_files(source_data, tgt_data, lang, file)
-            all_report_rows.extend(issues)
-
-    # Generate report
-    token = str(uuid.uuid4())
-    date_str = datetime.now().strftime("%d-%b-%Y")
-    report_name = f"Comparison_Report_{date_str}.xlsx"
-    output_path = os.path.join(tempfile.gettempdir(), f"{token}__{report_name}")
-
-    df = pd.DataFrame(all_report_rows)
-    with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name='Report', index=False)
-        workbook = writer.book
-        worksheet = writer.sheets['Report']
-        wrap_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
-        for i, col in enumerate(df.columns):
-            width = max(df[col].astype(str).map(len).max(), len(col)) + 5
-            worksheet.set_column(i, i, width, wrap_format)
-
-    return output_path, token, report_name, all_report_rows
 
+            if tgt_data or not err:
+                file_rows.extend(compare(source_data, tgt_data, lang, file, source_analysis))
+            all_report_rows.extend(file_rows)
+            if checkpoint is not None:
+                checkpoint.complete(rel_path, input_hash, result=file_rows)
+
+    return all_report_rows
+
+def run_final_comparison_from_zip(source_files, translated_zip_file, backend=None, job_dir=None):
+    """
+    Compares the uploads and writes the report. With a `job_dir` (see checkpoints),
+    per-file results are checkpointed there, so a rerun of an interrupted job only
+    compares the files that were not finished.
+    """
+    compare = get_compare_backend(backend)
+    context = LanguageContext()
+    if job_dir:
+        all_report_rows = collect_report_rows(source_files, translated_zip_file, os.path.join(job_dir, 'Input'),
+                                              context, compare, Checkpoint(job_dir))
+    else:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            all_report_rows = collect_report_rows(source_files, translated_zip_file, temp_dir, context, compare)
+
+    summary = aggregate_issues(all_report_rows)
+    output_path, token, report_name = save_report(all_report_rows, summary=summary)
+    return output_path, token, report_name, all_report_rows, summary
+
+def cached_comparison(digest):
+    cached = report_cache.lookup(digest)
+    rows = load_report_rows(cached["token"]) if cached else None
+    if rows is None:
+        return None
+    return cached["token"], cached["report_name"], rows, aggregate_issues(rows)
+
+def compare_uploads(source_files, translated_zip_file, backend=None):
+    """
+    Compares uploaded files. An identical earlier run (same uploads, same rule
+    profiles) is answered from the report cache with its token and rows; otherwise
+    the run is checkpointed in a job dir and its report cached.
+    Returns (token, report_name, rows, summary).
+    """
+    digest = upload_digest(list(source_files) + [translated_zip_file], ('final_compare', rules_version()))
+    cached = cached_comparison(digest)
+    if cached:
+        return cached
+
+    # Same uploads -> same job dir, so a rerun after a crash resumes where it stopped
+    job_dir = open_job(digest)
+    with job_lock(job_dir):
+        # An identical request may have finished while this one waited for the lock
+        cached = cached_comparison(digest)
+        if cached:
+            return cached
+
+        output_path, token, report_name, rows, summary = run_final_comparison_from_zip(
+            source_files, translated_zip_file, backend=backend, job_dir=job_dir)
+        finish_job(job_dir)
+        report_cache.store(digest, token, report_name, [output_path, rows_path(token)])
+    return token, report_name, rows, summary
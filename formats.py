@@ -0,0 +1,980 @@
+import os
+import re
+import json
+import struct
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from xml.sax.saxutils import escape as xml_escape
+import bundle_readers
+from bundle_merge import merge_json_bundle, merge_properties_bundle
+
+# Extension -> adapter. Every pipeline (preprocess, postprocess, compare) looks formats
+# up here, so a format registered once is supported everywhere.
+FORMATS = {}
+
+def register_format(adapter):
+    for ext in adapter.extensions:
+        FORMATS[ext] = adapter
+    return adapter
+
+def get_format(path):
+    """Returns the adapter for a file name or path, or None when the extension is unknown."""
+    return FORMATS.get(os.path.splitext(path)[1].lower())
+
+def supported_extensions():
+    return sorted(FORMATS)
+
+class BundleFormat(ABC):
+    """
+    Reads and writes one kind of resource bundle as a flat {key: value} map.
+
+    For JSON and .properties, values are "raw" (exactly as written in the file, escapes
+    untouched) or decoded: the preprocessors read raw values and the legacy
+    postprocessor writes them back raw, while TEP postprocessing escapes what it
+    writes. The other formats always decode on read and escape on write, so they
+    ignore `raw`. `lenient` keeps entries a strict parse would drop, where the format
+    allows it. Writers may be given the `sources` ({key: source text}) of the data and
+    the target `lang`, for formats that store them in the file (gettext).
+    Adapters must implement iter_entries and write; one missing either cannot be created.
+    """
+    label = ""
+    extensions = ()
+
+    @abstractmethod
+    def iter_entries(self, path, raw=True, lenient=False):
+        """Yields (key, value) pairs in file order."""
+
+    def read(self, path, raw=True, lenient=False):
+        return dict(self.iter_entries(path, raw=raw, lenient=lenient))
+
+    def load(self, path, convert=None):
+        """
+        Reads decoded values for comparison; returns (data, error) instead of raising.
+        `convert` repairs values taken straight from the text (e.g. mis-decoded UTF-8).
+        """
+        try:
+            data = self.read(path, raw=False)
+        except Exception as e:
+            return None, str(e)
+        if convert:
+            data = {key: convert(value) if isinstance(value, str) else value for key, value in data.items()}
+        return data, None
+
+    @abstractmethod
+    def write(self, data, path, raw=False, sources=None, lang=None):
+        """Writes `data` as a complete bundle at `path`."""
+
+    def expand_plurals(self, data, lang):
+        """
+        Adds the plural forms `lang` needs that `data` lacks, so they can be translated.
+        Only gettext keys plural forms by index; other formats return `data` as is.
+        """
+        return data
+
+    def merge(self, base_path, data, output_path, raw=False, lenient=False, sources=None, lang=None):
+        """
+        Writes `base_path` with the values in `data` replaced or added. This default
+        rewrites the merged map; formats that can patch the file in place override it.
+        """
+        merged = self.read(base_path, raw=raw, lenient=lenient)
+        merged.update(data)
+        self.write(merged, output_path, raw=raw, sources=sources, lang=lang)
+
+# ---------- JSON ----------
+
+JSON_LENIENT_LINE = re.compile(r'\s*"([^"]+)"\s*:\s*"(.*)"\s*,?\s*$')
+
+def escape_json_value(value):
+    return json.dumps(value, ensure_ascii=False)[1:-1]
+
+class JsonFormat(BundleFormat):
+    label = "JSON"
+    extensions = ('.json',)
+
+    def iter_entries(self, path, raw=True, lenient=False):
+        if not raw:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield from json.load(f).items()
+        elif lenient:
+            yield from self._iter_lenient(path)
+        else:
+            # One pair per line; anything else (nesting, broken lines) is skipped
+            for match in bundle_readers.JSON_LINE_PAIR.finditer(bundle_readers.read_text(path)):
+                yield match[1], match[2]
+
+    def _iter_lenient(self, path):
+        """Line by line; lines that are not "key": "value" still give key: raw rest of line."""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                match = JSON_LENIENT_LINE.match(line)
+                if match:
+                    yield match.groups()
+                else:
+                    # Malformed lines like: "key": {<tag>}
+                    parts = line.strip().split(":", 1)
+                    if len(parts) == 2:
+                        yield parts[0].strip().strip('"'), parts[1].strip().rstrip(',').strip()
+
+    def load(self, path, convert=None):
+        # One read of the file, also when the JSON is broken and pairs are recovered
+        return bundle_readers.load_json(path, convert=convert)
+
+    def write(self, data, path, raw=False, sources=None, lang=None):
+        with open(path, 'w', encoding='utf-8') as f:
+            if not raw:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+                return
+            f.write("{\n")
+            for i, (k, v) in enumerate(data.items()):
+                comma = ',' if i < len(data) - 1 else ''
+                f.write(f'  "{k}": "{v}"{comma}\n')
+            f.write("}\n")
+
+    def merge(self, base_path, data, output_path, raw=False, lenient=False, sources=None, lang=None):
+        try:
+            merge_json_bundle(base_path, data, output_path, escape=(lambda v: v) if raw else escape_json_value)
+        except ValueError:
+            # Layout we cannot patch line by line (e.g. minified JSON): rewrite merged content
+            super().merge(base_path, data, output_path, raw=raw, lenient=lenient, sources=sources, lang=lang)
+
+# ---------- .properties ----------
+
+def escape_properties_value(value):
+    return value.replace('\n', '\\n').replace('=', '\\=').replace(':', '\\:')
+
+def unescape_properties_value(value):
+    return value.replace('\\n', '\n').replace('\\=', '=').replace('\\:', ':')
+
+class PropertiesFormat(BundleFormat):
+    label = "Properties"
+    extensions = ('.properties',)
+
+    def iter_entries(self, path, raw=True, lenient=False):
+        if raw:
+            # key=value lines, skipping blank and '#' lines; keys and values are stripped
+            for match in bundle_readers.PROPERTIES_PAIR.finditer(bundle_readers.read_text(path)):
+                yield match[1].strip(), match[2].strip()
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip() and not line.startswith('#') and '=' in line:
+                    k, v = line.rstrip('\n').split('=', 1)
+                    yield k.strip(), unescape_properties_value(v)
+
+    def load(self, path, convert=None):
+        # Compared as written: values are stripped but not unescaped
+        try:
+            data = self.read(path)
+        except Exception as e:
+            return None, str(e)
+        return ({key: convert(value) for key, value in data.items()} if convert else data), None
+
+    def write(self, data, path, raw=False, sources=None, lang=None):
+        with open(path, 'w', encoding='utf-8') as f:
+            for k, v in data.items():
+                f.write(f"{k}={v if raw else escape_properties_value(v)}\n")
+
+    def merge(self, base_path, data, output_path, raw=False, lenient=False, sources=None, lang=None):
+        merge_properties_bundle(base_path, data, output_path, escape=(lambda v: v) if raw else escape_properties_value)
+
+# ---------- Flutter ARB ----------
+
+class ArbFormat(BundleFormat):
+    """JSON whose "@key" / "@@locale" entries are metadata, not strings; metadata survives merges."""
+    label = "ARB"
+    extensions = ('.arb',)
+
+    def iter_entries(self, path, raw=True, lenient=False):
+        with open(path, 'r', encoding='utf-8') as f:
+            for key, value in json.load(f).items():
+                if not key.startswith('@'):
+                    yield key, value
+
+    def load(self, path, convert=None):
+        data, error = bundle_readers.load_json(path, convert=convert)
+        if data is not None:
+            data = {key: value for key, value in data.items() if not key.startswith('@')}
+        return data, error
+
+    def write(self, data, path, raw=False, sources=None, lang=None):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def merge(self, base_path, data, output_path, raw=False, lenient=False, sources=None, lang=None):
+        with open(base_path, 'r', encoding='utf-8') as f:
+            merged = json.load(f)
+        merged.update(data)
+        self.write(merged, output_path)
+
+# ---------- iOS .strings ----------
+
+# Comments are matched too, so quotes inside them are never taken for entries
+STRINGS_TOKEN = re.compile(
+    r'/\*.*?\*/|//[^\n]*|"((?:[^"\\]|\\.)*)"\s*=\s*"((?:[^"\\]|\\.)*)"\s*;', re.DOTALL)
+STRINGS_ESCAPE = re.compile(r'\\(U[0-9a-fA-F]{4}|.)', re.DOTALL)
+STRINGS_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\', "'": "'", '0': '\0'}
+
+def unescape_strings_value(value):
+    def replace(match):
+        code = match.group(1)
+        if code[0] == 'U' and len(code) == 5:
+            return chr(int(code[1:], 16))
+        return STRINGS_ESCAPES.get(code, code)
+    return STRINGS_ESCAPE.sub(replace, value)
+
+def escape_strings_value(value):
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n').replace('\t', '\\t').replace('\r', '\\r'))
+
+def read_strings_text(path):
+    """.strings files are UTF-16 when they carry a BOM (Xcode's default), UTF-8 otherwise."""
+    with open(path, 'rb') as f:
+        head = f.read(2)
+    encoding = 'utf-16' if head in (b'\xff\xfe', b'\xfe\xff') else 'utf-8-sig'
+    with open(path, 'r', encoding=encoding) as f:
+        return f.read()
+
+class StringsFormat(BundleFormat):
+    label = "Strings"
+    extensions = ('.strings',)
+
+    def iter_entries(self, path, raw=True, lenient=False):
+        for match in STRINGS_TOKEN.finditer(read_strings_text(path)):
+            if match[1] is None:
+                continue  # comment
+            yield unescape_strings_value(match[1]), unescape_strings_value(match[2])
+
+    def write(self, data, path, raw=False, sources=None, lang=None):
+        with open(path, 'w', encoding='utf-8') as f:
+            for k, v in data.items():
+                f.write(f'"{escape_strings_value(k)}" = "{escape_strings_value(v)}";\n')
+
+    def merge(self, base_path, data, output_path, raw=False, lenient=False, sources=None, lang=None):
+        """Replaces values in place, keeping comments and layout; new keys are appended."""
+        text = read_strings_text(base_path)
+        pending = dict(data)
+        with open(output_path, 'w', encoding='utf-8') as out:
+            last = 0
+            for match in STRINGS_TOKEN.finditer(text):
+                key = None if match[1] is None else unescape_strings_value(match[1])
+                if key in pending:
+                    value = pending.pop(key)
+                    out.write(text[last:match.start(2)])
+                    out.write(escape_strings_value(value))
+                    last = match.end(2)
+            out.write(text[last:])
+            if pending and text and not text.endswith('\n'):
+                out.write('\n')
+            for k, v in pending.items():
+                out.write(f'"{escape_strings_value(k)}" = "{escape_strings_value(v)}";\n')
+
+# ---------- YAML (PyYAML, imported on first use) ----------
+
+# Rails-style files nest everything under the locale: `fr: {greeting: ...}`. The root is
+# dropped only when it is the document's sole top-level key, a mapping, and looks like a
+# language code (two letters, optional region); a file with `id:` next to other keys
+# keeps it. Writers given a `lang` nest the output under it again.
+LOCALE_ROOT = re.compile(r'^[a-z]{2}(?:[-_][A-Za-z]{2,4})?$')
+
+def require_yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError("❌ YAML bundles need PyYAML: pip install pyyaml") from None
+    return yaml
+
+def yaml_locale_root(yaml, events):
+    """The locale root key of a document (see LOCALE_ROOT), or None; reads events only."""
+    depth = 0
+    top_keys = []  # [key, value is a mapping] per key of the top-level mapping
+    expecting_key = True
+    for event in events:
+        if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+            is_mapping = isinstance(event, yaml.MappingStartEvent)
+            if depth == 0 and not is_mapping:
+                return None
+            if depth == 1:
+                if expecting_key:
+                    return None  # complex key
+                top_keys[-1][1] = is_mapping
+            depth += 1
+        elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+            depth -= 1
+            if depth == 1:
+                expecting_key = True
+        elif depth == 1 and isinstance(event, (yaml.ScalarEvent, yaml.AliasEvent)):
+            if expecting_key:
+                if top_keys:
+                    return None  # a second top-level key
+                top_keys.append([event.value if isinstance(event, yaml.ScalarEvent) else '', False])
+            expecting_key = not expecting_key
+    if len(top_keys) == 1 and top_keys[0][1] and LOCALE_ROOT.match(top_keys[0][0]):
+        return top_keys[0][0]
+    return None
+
+def iter_yaml_scalars(yaml, events, locale_root=None):
+    """
+    Flattens a YAML event stream into ("a.b.c", scalar) pairs without building the
+    document; sequence items are keyed by index and the `locale_root` key is dropped.
+    """
+    keys = []
+    frames = []  # one [is_mapping, expecting_key | next_index] per open collection
+
+    def end_value():
+        if frames:
+            keys.pop()
+            if frames[-1][0]:
+                frames[-1][1] = True
+
+    for event in events:
+        if isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+            frames.pop()
+            end_value()
+            continue
+        if not isinstance(event, (yaml.ScalarEvent, yaml.AliasEvent, yaml.MappingStartEvent,
+                                  yaml.SequenceStartEvent)):
+            continue  # stream and document markers
+
+        frame = frames[-1] if frames else None
+        if frame and frame[0] and frame[1] is True:
+            keys.append(event.value if isinstance(event, yaml.ScalarEvent) else '')
+            frame[1] = False
+            continue
+        if frame and not frame[0]:
+            keys.append(str(frame[1]))
+            frame[1] += 1
+
+        if isinstance(event, yaml.MappingStartEvent):
+            if len(frames) == 1 and locale_root is not None and keys[-1] == locale_root:
+                keys[-1] = None
+            frames.append([True, True])
+        elif isinstance(event, yaml.SequenceStartEvent):
+            frames.append([False, 0])
+        else:
+            if isinstance(event, yaml.ScalarEvent) and keys:
+                yield '.'.join(k for k in keys if k is not None), event.value
+            end_value()
+
+def set_path(tree, key, value):
+    """Sets a dotted key, descending into mappings and, by index, into sequences."""
+    node = tree
+    parts = key.split('.')
+    for depth, part in enumerate(parts):
+        if isinstance(node, list):
+            if not part.isdigit() or int(part) > len(node):
+                break
+            part = int(part)
+            if part == len(node):
+                node.append(None)
+        elif not isinstance(node, dict):
+            break
+        if depth == len(parts) - 1:
+            node[part] = value
+            return
+        if isinstance(node, dict) and part not in node or node[part] is None:
+            node[part] = {}
+        node = node[part]
+    tree[key] = value  # "a" and "a.b" both exist: keep this one flat
+
+def listify(node):
+    """Turns mappings keyed "0".."n-1" (sequence items read as dotted keys) back into lists."""
+    if isinstance(node, dict):
+        for key, child in node.items():
+            node[key] = listify(child)
+        if node and all(key == str(i) for i, key in enumerate(node)):
+            return list(node.values())
+    return node
+
+def split_locale_root(tree):
+    """(root key, mapping below it) for a document with a locale root, else (None, tree)."""
+    if isinstance(tree, dict) and len(tree) == 1:
+        root, child = next(iter(tree.items()))
+        if isinstance(child, dict) and LOCALE_ROOT.match(str(root)):
+            return root, child
+    return None, tree
+
+class YamlFormat(BundleFormat):
+    """Nested mappings as dotted keys. Needs PyYAML, imported only when a YAML file is met."""
+    label = "YAML"
+    extensions = ('.yaml', '.yml')
+
+    def iter_entries(self, path, raw=True, lenient=False):
+        yaml = require_yaml()
+        with open(path, 'r', encoding='utf-8') as f:
+            locale_root = yaml_locale_root(yaml, yaml.parse(f))
+            f.seek(0)
+            yield from iter_yaml_scalars(yaml, yaml.parse(f), locale_root)
+
+    def write(self, data, path, raw=False, sources=None, lang=None):
+        tree = {}
+        for key, value in data.items():
+            set_path(tree, key, value)
+        tree = listify(tree)
+        self._dump({lang: tree} if lang else tree, path)
+
+    def merge(self, base_path, data, output_path, raw=False, lenient=False, sources=None, lang=None):
+        yaml = require_yaml()
+        with open(base_path, 'r', encoding='utf-8') as f:
+            tree = yaml.safe_load(f) or {}
+        _, node = split_locale_root(tree)
+        for key, value in data.items():
+            set_path(node, key, value)
+        self._dump(tree, output_path)
+
+    def _dump(self, tree, path):
+        yaml = require_yaml()
+        with open(path, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(tree, f, allow_unicode=True, sort_keys=False, default_flow_style=False)
+
+# ---------- gettext .po / .mo ----------
+
+# Flat keys: the msgid, prefixed by "<msgctxt>::" when the entry has a context; plural
+# entries give one key per form, "<key>[0]", "<key>[1]", ... Keys must survive XLIFF,
+# so gettext's own "\x04" separator cannot be used. Instead ":" and "\" are escaped in
+# the context, an empty context is written "\0", and a msgid without context that
+# contains "::" is keyed "::<msgid>", so every key maps back to one message.
+CONTEXT_SEPARATOR = "::"
+EMPTY_CONTEXT = "\\0"
+PO_PLURAL_KEY = re.compile(r'^(.*)\[(\d+)\]$', re.DOTALL)
+PO_KEYWORD = re.compile(r'^(msgctxt|msgid_plural|msgid|msgstr)(?:\[(\d+)\])?\s*"(.*)"$')
+PO_STRING = re.compile(r'^"(.*)"$')
+PO_ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+PO_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'a': '\a', 'b': '\b', 'f': '\f', 'v': '\v', '"': '"', '\\': '\\'}
+# Plural-Forms of the languages whose rule is not gettext's default (n != 1)
+PLURAL_FORMS = {
+    'nplurals=1; plural=0;': ('ja', 'zh', 'ko', 'vi', 'th', 'id', 'ms', 'lo', 'km', 'my'),
+    'nplurals=2; plural=(n > 1);': ('fr', 'pt_br', 'hy', 'fil', 'tr'),
+    'nplurals=3; plural=(n%10==1 && n%100!=11 ? 0 : n%10>=2 && n%10<=4 && (n%100<10 || n%100>=20) ? 1 : 2);':
+        ('ru', 'uk', 'be', 'sr', 'hr', 'bs'),
+    'nplurals=3; plural=(n==1 ? 0 : n%10>=2 && n%10<=4 && (n%100<10 || n%100>=20) ? 1 : 2);': ('pl',),
+    'nplurals=3; plural=(n==1 ? 0 : n>=2 && n<=4 ? 1 : 2);': ('cs', 'sk'),
+    'nplurals=6; plural=(n==0 ? 0 : n==1 ? 1 : n==2 ? 2 : n%100>=3 && n%100<=10 ? 3 : n%100>=11 ? 4 : 5);': ('ar',),
+}
+PLURAL_FORMS_BY_LANG = {lang: rule for rule, langs in PLURAL_FORMS.items() for lang in langs}
+DEFAULT_PLURAL_FORMS = 'nplurals=2; plural=(n != 1);'
+MO_MAGIC = 0x950412de
+
+def gettext_key(msgctxt, msgid):
+    if msgctxt is None:
+        return CONTEXT_SEPARATOR + msgid if CONTEXT_SEPARATOR in msgid else msgid
+    context = msgctxt.replace('\\', '\\\\').replace(':', '\\:') or EMPTY_CONTEXT
+    return f"{context}{CONTEXT_SEPARATOR}{msgid}"
+
+def split_gettext_key(key):
+    """Inverse of gettext_key: (msgctxt or None, msgid)."""
+    if key.startswith(CONTEXT_SEPARATOR):
+        return None, key[len(CONTEXT_SEPARATOR):]
+    i = 0
+    while i < len(key):
+        if key[i] == '\\':
+            i += 2
+        elif key.startswith(CONTEXT_SEPARATOR, i):
+            context = key[:i]
+            msgctxt = '' if context == EMPTY_CONTEXT else re.sub(r'\\(.)', r'\1', context)
+            return msgctxt, key[i + len(CONTEXT_SEPARATOR):]
+        else:
+            i += 1
+    return None, key
+
+def gettext_header(lang=None):
+    """Header (msgstr of msgid "") of a new catalogue, with the Plural-Forms of `lang`."""
+    header = "Content-Type: text/plain; charset=UTF-8\n"
+    if lang:
+        locale = lang.replace('-', '_')
+        rule = (PLURAL_FORMS_BY_LANG.get(locale.lower()) or
+                PLURAL_FORMS_BY_LANG.get(locale.split('_')[0].lower(), DEFAULT_PLURAL_FORMS))
+        header = f"Language: {locale}\n{header}Plural-Forms: {rule}\n"
+    return header
+
+def gettext_nplurals(header):
+    """Number of plural forms declared by a catalogue header (None when it has no Plural-Forms)."""
+    match = re.search(r'nplurals\s*=\s*(\d+)', header or '')
+    return int(match[1]) if match else None
+
+def plural_msgstrs(msgstrs, nplurals=None):
+    """
+    The msgstr[i] of a plural message: exactly `nplurals` forms when the catalogue
+    declares them, missing ones repeating the last form given.
+    """
+    last = msgstrs.get(max(msgstrs, default=0), '')
+    return [msgstrs.get(i, last) for i in range(nplurals or max(msgstrs, default=1) + 1)]
+
+def expand_plural_forms(data, lang):
+    """Pads the plural messages of flat gettext `data` to the forms `lang` declares."""
+    nplurals = gettext_nplurals(gettext_header(lang))
+    expanded = {}
+    for key, value in data.items():
+        expanded[key] = value
+        match = PO_PLURAL_KEY.match(key)
+        if not match or f"{match[1]}[0]" not in data or f"{match[1]}[{int(match[2]) + 1}]" in data:
+            continue
+        for i in range(int(match[2]) + 1, nplurals or 0):
+            expanded[f"{match[1]}[{i}]"] = value
+    return expanded
+
+def gettext_pairs(msgctxt, msgid, msgid_plural, msgstrs):
+    """
+    Flat (key, value) pairs of one message. An empty translation reads as its source
+    text, so .pot files work as sources and untranslated entries show up as such.
+    """
+    key = gettext_key(msgctxt, msgid)
+    if msgid_plural is None:
+        return [(key, msgstrs.get(0) or msgid)]
+    forms = max(msgstrs, default=1) + 1
+    return [(f"{key}[{i}]", msgstrs.get(i) or (msgid if i == 0 else msgid_plural)) for i in range(forms)]
+
+def group_gettext_keys(data, sources=None):
+    """
+    Turns flat keys back into messages: {key: (msgctxt, msgid, msgid_plural, {index: text})}.
+    msgid_plural comes from the source text of form [1] when `sources` has it.
+    """
+    sources = sources or {}
+    messages = {}
+    for key, value in data.items():
+        match = PO_PLURAL_KEY.match(key)
+        # "Page [2]" alone is a msgid; plural forms always come with their form [0]
+        base, index = (match[1], int(match[2])) if match and f"{match[1]}[0]" in data else (key, None)
+        msgctxt, msgid = split_gettext_key(base)
+        if index is None:
+            messages[base] = (msgctxt, msgid, None, {0: value})
+            continue
+        message = messages.setdefault(base, (msgctxt, msgid, sources.get(f"{base}[1]") or msgid, {}))
+        message[3][index] = value
+    return messages
+
+def unescape_po(text):
+    return PO_ESCAPE.sub(lambda m: PO_ESCAPES.get(m.group(1), m.group(1)), text)
+
+def escape_po(text):
+    return (text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            .replace('\t', '\\t').replace('\r', '\\r'))
+
+def po_field(keyword, text):
+    """One keyword line, or gettext's multi-line layout when the text has inner newlines."""
+    if '\n' not in text[:-1]:
+        return f'{keyword} "{escape_po(text)}"\n'
+    return f'{keyword} ""\n' + ''.join(f'"{escape_po(part)}"\n' for part in text.splitlines(keepends=True))
+
+def render_po_message(msgctxt, msgid, msgid_plural, msgstrs, comments=(), nplurals=None):
+    out = list(comments)
+    if msgctxt is not None:
+        out.append(po_field('msgctxt', msgctxt))
+    out.append(po_field('msgid', msgid))
+    if msgid_plural is None:
+        out.append(po_field('msgstr', msgstrs.get(0, '')))
+    else:
+        out.append(po_field('msgid_plural', msgid_plural))
+        for i, msgstr in enumerate(plural_msgstrs(msgstrs, nplurals)):
+            out.append(po_field(f'msgstr[{i}]', msgstr))
+    return ''.join(out)
+
+def new_po_entry():
+    return {"msgctxt": None, "msgid": None, "msgid_plural": None, "msgstr": {}, "lines": []}
+
+def iter_po_entries(lines):
+    """
+    Streams the entries of a .po file. Each keeps its source `lines` (comments, flags,
+    trailing blank lines), so entries can be written back untouched. The header
+    (msgid "") and runs of comments or obsolete "#~" lines come through as entries too.
+    """
+    entry = new_po_entry()
+    field = None
+    for line in lines:
+        stripped = line.strip()
+        match = PO_KEYWORD.match(stripped)
+        starts = stripped.startswith('#') or (match and match[1] in ('msgctxt', 'msgid'))
+        if starts and entry["msgstr"]:
+            yield entry
+            entry = new_po_entry()
+        entry["lines"].append(line)
+
+        if match:
+            keyword, index, text = match.groups()
+            text = unescape_po(text)
+            if keyword == 'msgstr':
+                field = int(index or 0)
+                entry["msgstr"][field] = text
+            else:
+                field = keyword
+                entry[keyword] = text
+            continue
+        string = PO_STRING.match(stripped)
+        if string and field is not None:
+            if isinstance(field, int):
+                entry["msgstr"][field] += unescape_po(string[1])
+            else:
+                entry[field] += unescape_po(string[1])
+        else:
+            field = None  # comment or blank line
+    if entry["lines"]:
+        yield entry
+
+def is_po_message(entry):
+    return entry["msgid"] is not None and (entry["msgid"] or entry["msgctxt"] is not None)
+
+def read_po_lines(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        yield from f
+
+class PoFormat(BundleFormat):
+    """
+    Gettext catalogues. Context and plural forms are kept in the keys (see
+    gettext_key); patching a delivered .po keeps comments, references and flags.
+    """
+    label = "PO"
+    extensions = ('.po', '.pot')
+
+    def iter_entries(self, path, raw=True, lenient=False):
+        for entry in iter_po_entries(read_po_lines(path)):
+            if is_po_message(entry):
+                yield from gettext_pairs(entry["msgctxt"], entry["msgid"], entry["msgid_plural"], entry["msgstr"])
+
+    def write(self, data, path, raw=False, sources=None, lang=None):
+        header = gettext_header(lang)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(render_po_message(None, '', None, {0: header}))
+            for message in group_gettext_keys(data, sources).values():
+                f.write('\n' + render_po_message(*message, nplurals=gettext_nplurals(header)))
+
+    def expand_plurals(self, data, lang):
+        return expand_plural_forms(data, lang)
+
+    def merge(self, base_path, data, output_path, raw=False, lenient=False, sources=None, lang=None):
+        """
+        Entries of the base whose key has a new translation are rewritten, the rest copied
+        as is. Plural forms follow the base header's Plural-Forms (else those of `lang`).
+        """
+        pending = group_gettext_keys(data, sources)
+        nplurals = gettext_nplurals(gettext_header(lang))
+        with open(output_path, 'w', encoding='utf-8') as out:
+            last_line = ''
+            for entry in iter_po_entries(read_po_lines(base_path)):
+                if entry["msgid"] == '' and entry["msgctxt"] is None:
+                    nplurals = gettext_nplurals(entry["msgstr"].get(0)) or nplurals
+                key = gettext_key(entry["msgctxt"], entry["msgid"]) if is_po_message(entry) else None
+                message = pending.pop(key, None)
+                if message is None:
+                    out.writelines(entry["lines"])
+                    last_line = entry["lines"][-1]
+                    continue
+                msgstrs = {**entry["msgstr"], **message[3]}  # forms without a new translation stay
+                if entry["msgid_plural"] is None:
+                    msgstrs = {0: msgstrs.get(0, '')}
+                # A new translation settles a fuzzy one: drop the flag and the previous msgid
+                comments = []
+                for line in entry["lines"]:
+                    stripped = line.strip()
+                    if not stripped.startswith('#'):
+                        break
+                    if stripped.startswith('#|'):
+                        continue
+                    if stripped.startswith('#,'):
+                        flags = [f.strip() for f in stripped[2:].split(',') if f.strip() and f.strip() != 'fuzzy']
+                        if not flags:
+                            continue
+                        line = f"#, {', '.join(flags)}\n"
+                    comments.append(line)
+                trailing = []
+                for line in reversed(entry["lines"]):
+                    if line.strip():
+                        break
+                    trailing.append(line)
+                out.write(render_po_message(entry["msgctxt"], entry["msgid"], entry["msgid_plural"], msgstrs, comments,
+                                            nplurals))
+                out.writelines(trailing)
+                last_line = trailing[0] if trailing else 'msgstr'
+            for message in pending.values():
+                out.write(('' if last_line.strip() == '' else '\n') + render_po_message(*message, nplurals=nplurals))
+                last_line = 'msgstr'
+
+def iter_mo_messages(path):
+    """
+    Streams (msgctxt, msgid, msgid_plural, {index: msgstr}) from a compiled catalogue
+    via mmap. The header comes through as the message with msgid "".
+    """
+    with bundle_readers.mapped(path) as buf:
+        if len(buf) < 20:
+            raise ValueError(f"❌ Not a gettext MO file: {os.path.basename(path)}")
+        magic = struct.unpack('<I', buf[:4])[0]
+        order = '<' if magic == MO_MAGIC else '>' if magic == struct.unpack('>I', struct.pack('<I', MO_MAGIC))[0] else None
+        if order is None:
+            raise ValueError(f"❌ Not a gettext MO file: {os.path.basename(path)}")
+        _, count, ids_offset, strs_offset = struct.unpack(order + '4I', buf[4:20])
+        charset = 'utf-8'
+        for i in range(count):
+            id_length, id_start = struct.unpack_from(order + '2I', buf, ids_offset + 8 * i)
+            str_length, str_start = struct.unpack_from(order + '2I', buf, strs_offset + 8 * i)
+            msgid = buf[id_start:id_start + id_length]
+            msgstr = buf[str_start:str_start + str_length]
+            if not msgid:
+                match = re.search(rb'charset=([\w-]+)', msgstr)
+                charset = match.group(1).decode('ascii') if match else charset
+                yield None, '', None, {0: msgstr.decode(charset)}
+                continue
+            msgctxt = None
+            if b'\x04' in msgid:
+                msgctxt, msgid = msgid.split(b'\x04', 1)
+                msgctxt = msgctxt.decode(charset)
+            msgid, _, msgid_plural = msgid.partition(b'\x00')
+            msgstrs = dict(enumerate(s.decode(charset) for s in msgstr.split(b'\x00')))
+            yield msgctxt, msgid.decode(charset), msgid_plural.decode(charset) if _ else None, msgstrs
+
+def write_mo(messages, path, header=None):
+    """
+    Compiles messages as in msgfmt: sorted by msgid, no hash table, little-endian.
+    Everything is written as UTF-8, so the charset of `header` is rewritten to match,
+    and plural messages get the number of forms its Plural-Forms declares.
+    """
+    header = re.sub(r'charset=[\w-]+', 'charset=UTF-8', header or gettext_header())
+    nplurals = gettext_nplurals(header)
+    entries = [(b'', header.encode('utf-8'))]
+    for msgctxt, msgid, msgid_plural, msgstrs in messages:
+        key = msgid.encode('utf-8')
+        if msgid_plural is not None:
+            key += b'\x00' + msgid_plural.encode('utf-8')
+            value = b'\x00'.join(msgstr.encode('utf-8') for msgstr in plural_msgstrs(msgstrs, nplurals))
+        else:
+            value = msgstrs.get(0, '').encode('utf-8')
+        if msgctxt is not None:
+            key = msgctxt.encode('utf-8') + b'\x04' + key
+        entries.append((key, value))
+    entries.sort()
+
+    count = len(entries)
+    ids_table = 28
+    strs_table = ids_table + 8 * count
+    data_start = strs_table + 8 * count
+    ids = b''.join(key + b'\x00' for key, _ in entries)
+    strs = b''.join(value + b'\x00' for _, value in entries)
+    id_offsets, str_offsets = [], []
+    id_pos, str_pos = data_start, data_start + len(ids)
+    for key, value in entries:
+        id_offsets += [len(key), id_pos]
+        str_offsets += [len(value), str_pos]
+        id_pos += len(key) + 1
+        str_pos += len(value) + 1
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<7I', MO_MAGIC, 0, count, ids_table, strs_table, 0, data_start))
+        f.write(struct.pack(f'<{4 * count}I', *id_offsets, *str_offsets))
+        f.write(ids)
+        f.write(strs)
+
+class MoFormat(BundleFormat):
+    label = "MO"
+    extensions = ('.mo',)
+
+    def iter_entries(self, path, raw=True, lenient=False):
+        for message in iter_mo_messages(path):
+            if message[1] or message[0] is not None:
+                yield from gettext_pairs(*message)
+
+    def write(self, data, path, raw=False, sources=None, lang=None):
+        write_mo(group_gettext_keys(data, sources).values(), path, gettext_header(lang))
+
+    def expand_plurals(self, data, lang):
+        return expand_plural_forms(data, lang)
+
+    def merge(self, base_path, data, output_path, raw=False, lenient=False, sources=None, lang=None):
+        messages = {gettext_key(m[0], m[1]): m for m in iter_mo_messages(base_path)}
+        header = messages.pop('', None)  # keeps the delivered Language and Plural-Forms
+        for key, message in group_gettext_keys(data, sources).items():
+            base = messages.get(key)
+            # Keep the base's msgid_plural, and its forms that have no new translation
+            messages[key] = message if base is None else (base[0], base[1], base[2], {**base[3], **message[3]})
+        write_mo(messages.values(), output_path, header[3][0] if header else gettext_header(lang))
+
+# ---------- Android strings.xml ----------
+
+# <string name="k">, <plurals name="k"> items as "k[one]", <string-array name="k"> items as "k[0]"
+ANDROID_QUANTITIES = ('zero', 'one', 'two', 'few', 'many', 'other')
+ANDROID_PLURAL_KEY = re.compile(r'^(.*)\[(zero|one|two|few|many|other)\]$', re.DOTALL)
+ANDROID_ARRAY_KEY = re.compile(r'^(.*)\[(\d+)\]$', re.DOTALL)
+ANDROID_NAMESPACES = {
+    'xliff': "urn:oasis:names:tc:xliff:document:1.2",
+    'tools': "http://schemas.android.com/tools",
+}
+ANDROID_ESCAPE = re.compile(r'\\(u[0-9a-fA-F]{4}|.)', re.DOTALL)
+ANDROID_ESCAPES = {'n': '\n', 't': '\t', "'": "'", '"': '"', '\\': '\\', '@': '@', '?': '?'}
+ANDROID_TAG = re.compile(r'(<[^<>]+>)')
+# Comments are matched too, so elements inside them are left alone
+ANDROID_ELEMENT = re.compile(
+    r'<!--.*?-->|<(string-array|plurals|string)(?=[\s>])([^>]*?)(?<!/)>(.*?)</\1\s*>', re.DOTALL)
+ANDROID_ITEM = re.compile(r'<!--.*?-->|<item(?=[\s>])([^>]*?)(?<!/)>(.*?)</item\s*>', re.DOTALL)
+NAME_ATTRIBUTE = re.compile(r'\bname\s*=\s*"([^"]*)"')
+QUANTITY_ATTRIBUTE = re.compile(r'\bquantity\s*=\s*"([^"]*)"')
+
+def unescape_android(text):
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        text = text[1:-1]  # quoted to keep whitespace
+    return ANDROID_ESCAPE.sub(
+        lambda m: chr(int(m.group(1)[1:], 16)) if len(m.group(1)) == 5 else ANDROID_ESCAPES.get(m.group(1), m.group(1)),
+        text)
+
+def escape_android(text, first=True):
+    text = (text.replace('\\', '\\\\').replace("'", "\\'").replace('"', '\\"')
+            .replace('\n', '\\n').replace('\t', '\\t'))
+    return '\\' + text if first and text[:1] in ('@', '?') else text
+
+def _qualified(name, prefixes):
+    if name.startswith('{'):
+        uri, local = name[1:].split('}', 1)
+        prefix = prefixes.get(uri)
+        return f"{prefix}:{local}" if prefix else local
+    return name
+
+def inner_xml(elem, prefixes):
+    """The content of an element as markup, with namespace prefixes as in the file."""
+    parts = [xml_escape(elem.text or '')]
+    for child in elem:
+        tag = _qualified(child.tag, prefixes)
+        attrs = ''.join(f' {_qualified(k, prefixes)}="{xml_escape(v, {chr(34): "&quot;"})}"'
+                        for k, v in child.attrib.items())
+        parts.append(f"<{tag}{attrs}>{inner_xml(child, prefixes)}</{tag}>")
+        parts.append(xml_escape(child.tail or ''))
+    return ''.join(parts)
+
+def android_text(elem, prefixes):
+    return unescape_android(inner_xml(elem, prefixes) if len(elem) else elem.text or '')
+
+def encode_android(value):
+    """
+    Element content for a value: inline markup (<b>, <xliff:g>) is kept when the value
+    is well-formed with it, everything else is escaped as text.
+    """
+    if ANDROID_TAG.search(value):
+        declarations = ''.join(f' xmlns:{p}="{uri}"' for p, uri in ANDROID_NAMESPACES.items())
+        try:
+            ET.fromstring(f"<string{declarations}>{value}</string>")
+            return ''.join(part if ANDROID_TAG.fullmatch(part) else escape_android(part, first=(i == 0))
+                           for i, part in enumerate(ANDROID_TAG.split(value)))
+        except ET.ParseError:
+            pass
+    return xml_escape(escape_android(value))
+
+def group_android_keys(data):
+    """{name: value} for strings, {name: {quantity or index: value}} for plurals and arrays."""
+    groups = {}
+    for key, value in data.items():
+        plural = ANDROID_PLURAL_KEY.match(key)
+        array = None if plural else ANDROID_ARRAY_KEY.match(key)
+        if plural:
+            groups.setdefault(plural[1], ('plurals', {}))[1][plural[2]] = value
+        elif array:
+            groups.setdefault(array[1], ('string-array', {}))[1][int(array[2])] = value
+        else:
+            groups[key] = ('string', value)
+    return groups
+
+def render_android_items(kind, items, indent):
+    lines = []
+    for item_key in sorted(items, key=lambda k: ANDROID_QUANTITIES.index(k) if kind == 'plurals' else k):
+        attr = f' quantity="{item_key}"' if kind == 'plurals' else ''
+        lines.append(f"{indent}<item{attr}>{encode_android(items[item_key])}</item>\n")
+    return ''.join(lines)
+
+def render_android_element(name, kind, value, indent='    '):
+    if kind == 'string':
+        return f'{indent}<string name="{xml_escape(name)}">{encode_android(value)}</string>\n'
+    return (f'{indent}<{kind} name="{xml_escape(name)}">\n'
+            f'{render_android_items(kind, value, indent * 2)}{indent}</{kind}>\n')
+
+def patch_android_items(kind, content, items):
+    """Replaces the <item>s of a plurals/string-array in place and appends missing ones."""
+    pending = dict(items)
+    index = 0
+    indent = None
+
+    def replace(match):
+        nonlocal index, indent
+        if match.group(1) is None:
+            return match.group(0)  # comment
+        if kind == 'plurals':
+            quantity = QUANTITY_ATTRIBUTE.search(match.group(1))
+            item_key = quantity.group(1) if quantity else None
+        else:
+            item_key, index = index, index + 1
+        if indent is None:
+            line_start = content.rfind('\n', 0, match.start()) + 1
+            indent = content[line_start:match.start()]
+        if item_key not in pending:
+            return match.group(0)
+        return f"<item{match.group(1)}>{encode_android(pending.pop(item_key))}</item>"
+
+    content = ANDROID_ITEM.sub(replace, content)
+    if pending:
+        body = content.rstrip()
+        content = body + '\n' + render_android_items(kind, pending, indent or '        ') + content[len(body):].lstrip('\n')
+    return content
+
+class AndroidStringsFormat(BundleFormat):
+    """
+    Android resource XML. Plurals and string arrays are kept as one key per item;
+    strings marked translatable="false" are not read. Patching a delivered file keeps
+    comments, attributes (formatted, tools:...) and layout.
+    """
+    label = "Android XML"
+    extensions = ('.xml',)
+
+    def iter_entries(self, path, raw=True, lenient=False):
+        prefixes = {}
+        depth = 0
+        for event, elem in ET.iterparse(path, events=('start-ns', 'start', 'end')):
+            if event == 'start-ns':
+                prefix, uri = elem
+                prefixes[uri] = prefix
+                continue
+            if event == 'start':
+                if depth == 0 and elem.tag != 'resources':
+                    raise ValueError(f"❌ Not an Android resources file: {os.path.basename(path)}")
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            name = elem.get('name')
+            if name is not None and elem.get('translatable') != 'false':
+                if elem.tag == 'string':
+                    yield name, android_text(elem, prefixes)
+                elif elem.tag == 'plurals':
+                    for item in elem.iter('item'):
+                        yield f"{name}[{item.get('quantity')}]", android_text(item, prefixes)
+                elif elem.tag == 'string-array':
+                    for i, item in enumerate(elem.iter('item')):
+                        yield f"{name}[{i}]", android_text(item, prefixes)
+            elem.clear()  # the finished element is no longer needed
+
+    def write(self, data, path, raw=False, sources=None, lang=None):
+        groups = group_android_keys(data)
+        body = ''.join(render_android_element(name, kind, value) for name, (kind, value) in groups.items())
+        declarations = ''.join(f' xmlns:{p}="{uri}"' for p, uri in ANDROID_NAMESPACES.items() if f"<{p}:" in body)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'<?xml version="1.0" encoding="utf-8"?>\n<resources{declarations}>\n{body}</resources>\n')
+
+    def merge(self, base_path, data, output_path, raw=False, lenient=False, sources=None, lang=None):
+        with open(base_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        pending = group_android_keys(data)
+
+        def replace(match):
+            kind = match.group(1)
+            name = NAME_ATTRIBUTE.search(match.group(2) or '')
+            if kind is None or name is None or pending.get(name.group(1), (None,))[0] != kind:
+                return match.group(0)
+            _, value = pending.pop(name.group(1))
+            content = encode_android(value) if kind == 'string' else patch_android_items(kind, match.group(3), value)
+            return f"<{kind}{match.group(2)}>{content}</{kind}>"
+
+        text = ANDROID_ELEMENT.sub(replace, text)
+        if pending:
+            close = text.rfind('</resources>')
+            if close == -1:
+                raise ValueError(f"❌ Cannot merge into {os.path.basename(base_path)}: no </resources>")
+            added = ''.join(render_android_element(name, kind, value) for name, (kind, value) in pending.items())
+            line_start = text.rfind('\n', 0, close) + 1
+            text = text[:line_start] + added + text[line_start:]
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+for adapter in (JsonFormat(), PropertiesFormat(), ArbFormat(), StringsFormat(), YamlFormat(),
+                PoFormat(), MoFormat(), AndroidStringsFormat()):
+    register_format(adapter)
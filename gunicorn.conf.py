@@ -0,0 +1,35 @@
+import os
+
+# gunicorn -c gunicorn.conf.py app:app
+#
+# Uploads spend most of their time in file I/O and in the legacy process pool, so each
+# worker serves several requests on threads; separate workers keep one slow comparison
+# from holding up the others. Every setting can be overridden from the environment.
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+
+workers = int(os.environ.get("WEB_CONCURRENCY", min(4, (os.cpu_count() or 1) + 1)))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+
+# Large bundles and comparisons run inside the request
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "600"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then so memory held by pandas/large uploads is returned;
+# jitter keeps them from all restarting at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "200"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "50"))
+
+# Import the app (Flask and the pipeline modules) once in the master: an import error stops
+# the server at startup instead of in every worker, and forked workers start at once.
+# pandas and langcodes load lazily on first use, in each worker, so they are not shared.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# Heartbeat files on a RAM disk, so a slow disk cannot make busy workers look dead
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,14 @@
+from collections import namedtuple
+
+KeyAlignment = namedtuple('KeyAlignment', ['ordered', 'common', 'missing', 'extra'])
+
+def align_keys(source, target):
+    """
+    Aligns the keys of two bundles in one pass each. `ordered` is source order followed
+    by target-only keys in target order, so reports come out identical between runs.
+    """
+    common, missing = [], []
+    for key in source:
+        (common if key in target else missing).append(key)
+    extra = [key for key in target if key not in source]
+    return KeyAlignment(ordered=list(source) + extra, common=common, missing=missing, extra=extra)
@@ -0,0 +1,61 @@
+import os
+import re
+import json
+from functools import lru_cache
+
+LANGUAGE_CODE_PATTERN = re.compile(r'^[a-z]{2,3}(-[A-Z]{2})?$')
+
+# Optional JSON file mapping language codes to the names used in our deliverables,
+# e.g. {"zh-TW": "Chinese-Traditional", "pt-BR": "Brazilian"}
+OVERRIDES_PATH = os.environ.get("LANGUAGE_NAME_OVERRIDES", "")
+
+_overrides = None
+
+def load_name_overrides(path=OVERRIDES_PATH):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return {code.lower(): name for code, name in json.load(f).items()}
+
+def set_name_overrides(overrides):
+    """Replaces the override table (code -> display name) and drops memoized names."""
+    global _overrides
+    _overrides = {code.lower(): name for code, name in overrides.items()}
+    _resolve_name.cache_clear()
+
+def get_name_overrides():
+    global _overrides
+    if _overrides is None:
+        _overrides = load_name_overrides()
+    return _overrides
+
+@lru_cache(maxsize=1024)
+def _resolve_name(lang_code):
+    override = get_name_overrides().get(lang_code.lower())
+    if override:
+        return override
+
+    import langcodes  # loaded on first use: its name data is slow to import
+    return langcodes.get(lang_code).language_name().title()
+
+def language_name(lang_code, default=None):
+    """
+    Returns the display name used in output filenames (e.g. 'ta-IN' -> 'Tamil').
+    Unknown codes raise unless a `default` is given.
+    """
+    try:
+        return _resolve_name(lang_code)
+    except Exception:
+        if default is None:
+            raise
+        return default
+
+@lru_cache(maxsize=4096)
+def language_from_filename(name):
+    """Takes the trailing '-xx' / '_xx' / '-tamil' token of a filename as its language."""
+    parts = re.split(r'[-_]', os.path.splitext(name)[0])
+    if parts:
+        last_part = parts[-1].lower()
+        if LANGUAGE_CODE_PATTERN.match(last_part) or last_part.isalpha():
+            return last_part
+    return "unknown"
@@ -1,128 +1,94 @@
 import os
 import re
 import zipfile
-import xml.etree.ElementTree as ET
-import langcodes
-
-def read_json_raw(path):
-    data = {}
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            match = re.match(r'\s*"([^"]+)"\s*:\s*"(.*)"\s*,?\s*$', line)
-            if match:
-                key, val = match.groups()
-                data[key] = val
-            else:
-                parts = line.strip().split(":", 1)
-                if len(parts) == 2:
-                    key = parts[0].strip().strip('"')
-                    val = parts[1].strip().rstrip(',').strip()
-                    data[key] = val
-    return data
-
-def write_json_raw(data, path):
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write("{\n")
-        for i, (k, v) in enumerate(data.items()):
-            comma = ',' if i < len(data) - 1 else ''
-            f.write(f'  "{k}": "{v}"{comma}\n')
-        f.write("}\n")
-
-def read_properties(path):
-    data = {}
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#') and '=' in line:
-                k, v = line.split('=', 1)
-                data[k.strip()] = v.strip()
-    return data
-
-def write_properties(data, path):
-    with open(path, 'w', encoding='utf-8') as f:
-        for k, v in data.items():
-            f.write(f"{k}={v}\n")
-
-def read_xliff(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-
-    if root.tag.startswith('{'):
-        ns_match = re.match(r'\{(.*)\}', root.tag)
-        ns_uri = ns_match.group(1) if ns_match else ''
-        ns = {'ns': ns_uri}
-        file_xpath = ".//ns:file"
-        trans_unit_xpath = ".//ns:trans-unit"
-        source_xpath = "ns:source"
-        target_xpath = "ns:target"
+from language_meta import language_name
+from checkpoints import xliff_digest
+from final_compare import compare_files
+from xliff_io import expand_keymap, iter_xliff_files, load_keymap
+from bundle_merge import find_base_bundle
+from formats import get_format
+
+def write_output(translations, original_name, lang_code, output_dir, base_dir=None, sources=None):
+    ext = os.path.splitext(original_name)[1].lower()
+    base_name = os.path.splitext(os.path.basename(original_name))[0]
+
+    # 🧹 Remove language suffixes like -en, _en_US, -ta-IN
+    base_name = re.sub(r'[-_](en|[a-z]{2}(?:[-_][A-Z]{2})?)$', '', base_name, flags=re.IGNORECASE)
+
+    lang_name = language_name(lang_code, default=lang_code)  # fallback to raw code
+
+    lang_folder = os.path.join(output_dir, lang_code)
+    os.makedirs(lang_folder, exist_ok=True)
+
+    renamed_file = f"{base_name}-{lang_name}{ext}"
+    output_path = os.path.join(lang_folder, renamed_file)
+
+    print(f"✅ Writing: {output_path} ({len(translations)} entries)")
+
+    # 🔀 Patch the existing target bundle in place when one was supplied
+    base_path = None
+    if base_dir:
+        base_path = (find_base_bundle(base_dir, lang_code, renamed_file) or
+                     find_base_bundle(base_dir, lang_code, os.path.basename(original_name)))
+
+    # Values are written back raw, exactly as they came out of the XLIFF
+    bundle_format = get_format(original_name)
+    if bundle_format is None:
+        print(f"⚠️ Unsupported extension: {ext}")
+        return None
+    if base_path:
+        bundle_format.merge(base_path, translations, output_path, raw=True, lenient=True,
+                            sources=sources, lang=lang_code)
     else:
-        ns = {}
-        file_xpath = ".//file"
-        trans_unit_xpath = ".//trans-unit"
-        source_xpath = "source"
-        target_xpath = "target"
-
-    file_node = root.find(file_xpath, namespaces=ns)
-    if file_node is None:
-        raise Exception(f"❌ XLIFF: <file> element not found in {file_path}")
-    
-    original_name = file_node.attrib.get('original', os.path.basename(file_path))
-    target_lang = file_node.attrib.get('target-language', 'xx')
-    translations = {}
+        bundle_format.write(translations, output_path, raw=True, sources=sources, lang=lang_code)
 
-    for tu in root.findall(trans_unit_xpath, namespaces=ns):
-        key = tu.attrib.get('resname')
-        if not key:
-            continue
-        target_elem = tu.find(target_xpath, namespaces=ns)
-        source_elem = tu.find(source_xpath, namespaces=ns)
-        value = (
-            target_elem.text if target_elem is not None and target_elem.text else
-            source_elem.text if source_elem is not None else ""
-        )
-        translations[key] = value
+    return os.path.relpath(output_path, output_dir)
 
-    return translations, original_name, target_lang
-
-def run_legacy_postprocessing(input_dir, output_dir):
+def run_legacy_postprocessing(input_dir, output_dir, base_dir=None, qa_rows=None, checkpoint=None):
+    """
+    Converts reviewed XLIFFs back into bundles. When `qa_rows` is a list, the
+    final-compare rules run on each file's in-memory source/target pairs and the
+    issue rows are appended to it.
+    With a `checkpoint`, XLIFFs converted by an interrupted run of the same job are skipped.
+    """
     renamed_files = []
 
     for filename in os.listdir(input_dir):
         if filename.endswith('.xliff'):
             xliff_path = os.path.join(input_dir, filename)
+            if checkpoint is not None:
+                input_hash = xliff_digest(xliff_path)
+                if checkpoint.is_done(filename, input_hash):
+                    done = checkpoint.result(filename)  # ⏭️ converted by an earlier run
+                    renamed_files.extend(done["files"])
+                    if qa_rows is not None:
+                        qa_rows.extend(done["qa"])
+                    continue
+
+            file_outputs, file_rows = [], []
+            keymaps = load_keymap(xliff_path)  # present when preprocessing deduplicated strings
+            # 📦 Package XLIFFs carry several <file> elements; each becomes its own bundle
             try:
-                translations, original_name, lang_code = read_xliff(xliff_path)
+                for translations, original_name, lang_code, sources in iter_xliff_files(xliff_path, fallback_to_source=True):
+                    if original_name in keymaps:
+                        translations = expand_keymap(translations, keymaps[original_name])
+                        sources = expand_keymap(sources, keymaps[original_name])
+                    rel_path = write_output(translations, original_name, lang_code, output_dir, base_dir, sources=sources)
+                    if rel_path:
+                        file_outputs.append(rel_path)
+                        if qa_rows is not None:
+                            file_rows.extend(compare_files(sources, translations, lang_code, os.path.basename(rel_path)))
             except Exception as e:
                 print(f"❌ Error parsing {filename}: {e}")
                 continue
-
-            ext = os.path.splitext(original_name)[1].lower()
-            base_name = os.path.splitext(os.path.basename(original_name))[0]
-
-            # 🧹 Remove language suffixes like -en, _en_US, -ta-IN
-            base_name = re.sub(r'[-_](en|[a-z]{2}(?:[-_][A-Z]{2})?)$', '', base_name, flags=re.IGNORECASE)
-
-            try:
-                lang_name = langcodes.get(lang_code).language_name().title()
-            except:
-                lang_name = lang_code  # fallback to raw code
-
-            lang_folder = os.path.join(output_dir, lang_code)
-            os.makedirs(lang_folder, exist_ok=True)
-
-            renamed_file = f"{base_name}-{lang_name}{ext}"
-            output_path = os.path.join(lang_folder, renamed_file)
-
-            print(f"✅ Writing: {output_path} ({len(translations)} entries)")
-
-            if ext == ".json":
-                write_json_raw(translations, output_path)
-            elif ext == ".properties":
-                write_properties(translations, output_path)
-            else:
-                print(f"⚠️ Unsupported extension: {ext}")
-                continue
-
-            renamed_files.append(os.path.relpath(output_path, output_dir))
+            finally:
+                renamed_files.extend(file_outputs)
+                if qa_rows is not None:
+                    qa_rows.extend(file_rows)
+
+            if checkpoint is not None:
+                checkpoint.complete(filename, input_hash, [os.path.join(output_dir, p) for p in file_outputs],
+                                    {"files": file_outputs, "qa": file_rows})
 
     if renamed_files:
         zip_path = os.path.join(output_dir, "batch.zip")
@@ -1,80 +1,123 @@
 import os
-import xml.etree.ElementTree as ET
-import re
-
-def read_json_raw(path):
-    """Reads JSON file with tolerant parsing (keeps malformed values as raw)."""
-    data = {}
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            # Match valid key-value pairs like: "key": "value"
-            match = re.match(r'\s*"([^"]+)"\s*:\s*"(.*)"\s*,?\s*$', line)
-            if match:
-                key, val = match.groups()
-                data[key] = val
-            else:
-                # Try fallback for malformed lines like: "key": {<tag>}
-                parts = line.strip().split(":", 1)
-                if len(parts) == 2:
-                    key = parts[0].strip().strip('"')
-                    val = parts[1].strip().rstrip(',').strip()
-                    data[key] = val
-    return data
-
-def read_properties(path):
-    data = {}
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#') and '=' in line:
-                k, v = line.split('=', 1)
-                data[k.strip()] = v.strip()
-    return data
-
-def write_xliff(data_keys, input_file, output_file, src_lang='en', tgt_lang='xx',
-                src_data=None, tgt_data=None, version='1.2'):
-
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-
-    if version == '1.2':
-        xliff = ET.Element('xliff', {'version': '1.2'})
-        file_tag = ET.SubElement(xliff, 'file', {
-            'source-language': src_lang,
-            'target-language': tgt_lang,
-            'datatype': 'plaintext',
-            'original': os.path.basename(input_file)
-        })
-        body = ET.SubElement(file_tag, 'body')
-
-        for i, key in enumerate(data_keys, start=1):
-            tu = ET.SubElement(body, 'trans-unit', {'id': str(i), 'resname': key})
-            ET.SubElement(tu, 'source').text = src_data.get(key, '')
-            ET.SubElement(tu, 'target').text = tgt_data.get(key, '')
-
-    elif version == '2.0':
-        ns = "urn:oasis:names:tc:xliff:document:2.0"
-        ET.register_namespace('', ns)
-        xliff = ET.Element(f'{{{ns}}}xliff', {
-            'version': '2.0',
-            'srcLang': src_lang,
-            'trgLang': tgt_lang
-        })
-        file_tag = ET.SubElement(xliff, f'{{{ns}}}file', {
-            'id': os.path.basename(input_file)
-        })
-
-        for i, key in enumerate(data_keys, start=1):
-            unit = ET.SubElement(file_tag, f'{{{ns}}}unit', {'id': str(i)})
-            segment = ET.SubElement(unit, f'{{{ns}}}segment')
-            ET.SubElement(segment, f'{{{ns}}}source').text = src_data.get(key, '')
-            ET.SubElement(segment, f'{{{ns}}}target').text = tgt_data.get(key, '')
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from checkpoints import file_digest, list_files, tree_digest
+from formats import get_format
+from key_alignment import align_keys
+from xliff_io import PACKAGE_NAME, dedup_units, save_keymap, write_xliff_package
+
+MAX_WORKERS = int(os.environ.get("LEGACY_PREPROCESS_WORKERS", min(4, os.cpu_count() or 1)))
+# Pool workers are not forked from the web worker: forking a threaded process can copy
+# locks held by other request threads. forkserver forks from a clean helper instead.
+START_METHOD = os.environ.get(
+    "LEGACY_PREPROCESS_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+# MAX_WORKERS bounds the whole web process, not each request: one request at a time
+# gets a pool, concurrent ones process their languages in their own thread
+POOL_LOCK = threading.Lock()
+
+def parse_sources(source_files):
+    """
+    Parses each source bundle once, tolerating malformed JSON lines (kept as raw text).
+    Returns ({base_name: data} shared by every language, errors of the sources that
+    could not be read, reported once for the whole run).
+    """
+    sources = {}
+    errors = []
+    for base_name, source_path in source_files.items():
+        bundle_format = get_format(base_name)
+        if bundle_format is None:
+            errors.append(f"❌ Unsupported file type: {base_name}")
+            continue
+        try:
+            sources[base_name] = bundle_format.read(source_path, lenient=True)
+        except Exception as e:
+            errors.append(f"❌ {bundle_format.label} read error in source {base_name}: {str(e)}")
+    return sources, errors
+
+# Pool workers get the parsed sources once, through the initializer, rather than
+# with every submitted language
+WORKER_SOURCES = None
+
+def init_worker(sources):
+    global WORKER_SOURCES
+    WORKER_SOURCES = sources
+
+def preprocess_language_in_worker(lang_code, lang_folder, *args):
+    return preprocess_language(lang_code, lang_folder, WORKER_SOURCES, *args)
+
+def preprocess_language(lang_code, lang_folder, sources, output_dir, version='1.2', single_file=False,
+                        dedup=False, inline_codes=False):
+    """
+    Writes the XLIFFs of one language folder (or a single package XLIFF with one
+    <file> per bundle) and returns that language's errors. With `dedup`, keys sharing
+    the same source and target text become one unit plus a .keymap.json sidecar.
+    With `inline_codes`, placeholders and tags are protected as XLIFF <ph> codes.
+    Plural messages get a unit for every form the language needs.
+    """
+    errors = []
+    package = []
+    keymaps = {}
 
-    else:
-        raise ValueError("❌ Invalid XLIFF version: Use '1.2' or '2.0'.")
+    for base_name, src_data in sources.items():
+        target_path = os.path.join(lang_folder, base_name)
+        if not os.path.exists(target_path):
+            errors.append(f"❌ Missing target for {base_name} in {lang_code}")
+            continue
+
+        bundle_format = get_format(base_name)
+        try:
+            tgt_data = bundle_format.expand_plurals(bundle_format.read(target_path, lenient=True), lang_code)
+        except Exception as ve:
+            errors.append(f"❌ {bundle_format.label} read error in {lang_code}/{base_name}: {str(ve)}")
+            continue
+        src_data = bundle_format.expand_plurals(src_data, lang_code)
 
-    ET.ElementTree(xliff).write(output_file, encoding='utf-8', xml_declaration=True)
+        try:
+            common_keys = align_keys(src_data, tgt_data).common
+            if not common_keys:
+                errors.append(f"⚠️ No common keys found in {base_name} ({lang_code})")
+                continue
 
-def run_legacy_preprocessing(input_dir, output_dir, version='1.2'):
-    errors = []
+            original_name = os.path.basename(target_path)
+            units = [(key, src_data.get(key, ''), tgt_data.get(key, '')) for key in common_keys]
+            if dedup:
+                units, keymaps[original_name] = dedup_units(units)
+
+            if single_file:
+                package.append((original_name, units))
+                continue
+
+            output_file = os.path.join(output_dir, lang_code, os.path.splitext(base_name)[0] + ".xliff")
+            write_xliff_package([(original_name, units)], output_file, tgt_lang=lang_code, version=version,
+                                inline_codes=inline_codes)
+            if dedup:
+                save_keymap({original_name: keymaps[original_name]}, output_file)
+
+        except Exception as e:
+            errors.append(f"❌ Failed processing {base_name} in {lang_code}: {str(e)}")
+
+    if package:
+        output_file = os.path.join(output_dir, lang_code, PACKAGE_NAME.format(lang=lang_code))
+        write_xliff_package(package, output_file, tgt_lang=lang_code, version=version,
+                            inline_codes=inline_codes)
+        if dedup:
+            save_keymap(keymaps, output_file)
+
+    return errors
+
+def run_legacy_preprocessing(input_dir, output_dir, version='1.2', max_workers=None, single_file=False,
+                             dedup=False, inline_codes=False, checkpoint=None):
+    """
+    Source bundles are parsed once up front; the language folders are then processed
+    in a process pool of at most `max_workers` (LEGACY_PREPROCESS_WORKERS) workers,
+    or serially while another request of this process holds the pool.
+    Source errors come first, then the errors of each language in folder order, as
+    in a serial run.
+    With a `checkpoint`, languages finished by an interrupted run of the same job
+    are skipped and their recorded errors reused.
+    """
 
     source_files = {
         f.replace("source_", ""): os.path.join(input_dir, f)
@@ -84,52 +127,60 @@ def run_legacy_preprocessing(input_dir, output_dir, version='1.2'):
 
     targets_root = os.path.join(input_dir, "targets")
     if not os.path.exists(targets_root):
-        raise Exception("Target ZIP not extracted or missing.")
-
-    for lang_code in os.listdir(targets_root):
-        lang_folder = os.path.join(targets_root, lang_code)
-        if not os.path.isdir(lang_folder):
-            continue
-
-        for base_name, source_path in source_files.items():
-            target_path = os.path.join(lang_folder, base_name)
-            if not os.path.exists(target_path):
-                errors.append(f"❌ Missing target for {base_name} in {lang_code}")
-                continue
-
-            ext = os.path.splitext(base_name)[1].lower()
-            try:
-                if ext == '.json':
+        raise ValueError("❌ Target ZIP not extracted or missing.")
+
+    languages = [
+        (lang_code, os.path.join(targets_root, lang_code))
+        for lang_code in os.listdir(targets_root)
+        if os.path.isdir(os.path.join(targets_root, lang_code))
+    ]
+    results = {}
+    hashes = {}
+    if checkpoint is not None:
+        for lang_code, lang_folder in languages:
+            hashes[lang_code] = tree_digest(lang_folder)
+            if checkpoint.is_done(lang_code, hashes[lang_code]):
+                results[lang_code] = checkpoint.result(lang_code) or []  # ⏭️ done in an earlier run
+    pending = [(lang_code, lang_folder) for lang_code, lang_folder in languages if lang_code not in results]
+
+    def finished(lang_code, lang_errors):
+        results[lang_code] = lang_errors
+        if checkpoint is not None:
+            outputs = list_files(os.path.join(output_dir, lang_code))
+            checkpoint.complete(lang_code, hashes[lang_code], outputs, lang_errors)
+
+    sources, source_errors = {}, []
+    sources_hash = "|".join(file_digest(source_files[name]) for name in sorted(source_files))
+    if pending:
+        sources, source_errors = parse_sources(source_files)
+        if checkpoint is not None:
+            checkpoint.complete("sources", sources_hash, [], source_errors)
+    elif checkpoint is not None and checkpoint.is_done("sources", sources_hash):
+        source_errors = checkpoint.result("sources") or []
+
+    workers = min(max_workers or MAX_WORKERS, len(pending))
+    if workers > 1 and POOL_LOCK.acquire(blocking=False):
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(START_METHOD),
+                                     initializer=init_worker, initargs=(sources,)) as pool:
+                futures = [
+                    (lang_code, pool.submit(preprocess_language_in_worker, lang_code, lang_folder,
+                                            output_dir, version, single_file, dedup, inline_codes))
+                    for lang_code, lang_folder in pending
+                ]
+                for lang_code, future in futures:
                     try:
-                        src_data = read_json_raw(source_path)
-                        tgt_data = read_json_raw(target_path)
-                    except Exception as ve:
-                        errors.append(f"❌ JSON read error in {lang_code}/{base_name}: {str(ve)}")
-                        continue
-                elif ext == '.properties':
-                    src_data = read_properties(source_path)
-                    tgt_data = read_properties(target_path)
-                else:
-                    errors.append(f"❌ Unsupported file type: {base_name}")
-                    continue
-
-                common_keys = [k for k in src_data if k in tgt_data]
-                if not common_keys:
-                    errors.append(f"⚠️ No common keys found in {base_name} ({lang_code})")
-                    continue
-
-                output_file = os.path.join(output_dir, lang_code, base_name.replace(ext, ".xliff"))
-                write_xliff(
-                    data_keys=common_keys,
-                    input_file=target_path,
-                    output_file=output_file,
-                    tgt_lang=lang_code,
-                    src_data=src_data,
-                    tgt_data=tgt_data,
-                    version=version
-                )
-
-            except Exception as e:
-                errors.append(f"❌ Failed processing {base_name} in {lang_code}: {str(e)}")
+                        finished(lang_code, future.result())
+                    except Exception as e:
+                        results[lang_code] = [f"❌ Failed processing {lang_code}: {str(e)}"]
+        finally:
+            POOL_LOCK.release()
+    else:
+        for lang_code, lang_folder in pending:
+            finished(lang_code, preprocess_language(lang_code, lang_folder, sources, output_dir, version,
+                                                    single_file, dedup, inline_codes))
 
+    errors = list(source_errors)
+    for lang_code, _ in languages:
+        errors.extend(results[lang_code])
     return errors
@@ -0,0 +1,25 @@
+import re
+
+# Placeholders, printf/shell variables and HTML tags that translators must keep verbatim
+PLACEHOLDER_PATTERN = re.compile(
+    r'\?"\{[^{}]+\}\?"|'
+    r'\{\d+\}|'
+    r'\{\{.*?\}\}|'
+    r'\{[^{}]+\}|'
+    r'<[^>]+>|'
+    r'%\w+|'
+    r'\$\w+'
+)
+
+def tokenize(text):
+    """Splits text into (chunk, is_placeholder) pieces in order; empty chunks are skipped."""
+    tokens = []
+    pos = 0
+    for match in PLACEHOLDER_PATTERN.finditer(text or ''):
+        if match.start() > pos:
+            tokens.append((text[pos:match.start()], False))
+        tokens.append((match.group(), True))
+        pos = match.end()
+    if text and pos < len(text):
+        tokens.append((text[pos:], False))
+    return tokens
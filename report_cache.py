@@ -0,0 +1,67 @@
+import os
+import json
+import tempfile
+import threading
+
+# Reports of earlier comparison runs, keyed by the digest of their inputs and rules
+CACHE_DIR = os.environ.get("REPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "l10n_report_cache"))
+# Most recently used entries kept; 0 disables the cache
+CACHE_SIZE = int(os.environ.get("REPORT_CACHE_SIZE", "32"))
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key[:32]}.json")
+
+def _discard(path):
+    """Removes a cache entry together with the report files it points to."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            files = json.load(f).get("files", [])
+    except (OSError, ValueError):
+        files = []
+    for file_path in files + [path]:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+def lookup(key, cache_dir=CACHE_DIR):
+    """Returns the cached entry {token, report_name, files} for a key, or None."""
+    path = _entry_path(key, cache_dir)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not all(os.path.exists(p) for p in entry["files"]):
+        _discard(path)  # report files were cleaned up behind our back
+        return None
+    try:
+        os.utime(path)  # mark as most recently used
+    except OSError:
+        return None  # evicted by another worker meanwhile
+    return entry
+
+def store(key, token, report_name, files, cache_dir=CACHE_DIR, max_entries=CACHE_SIZE):
+    """Records the report of a run; the least recently used entries beyond `max_entries` are evicted."""
+    if max_entries <= 0:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"token": token, "report_name": report_name, "files": list(files)}, f)
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_entries)
+
+def evict(cache_dir=CACHE_DIR, max_entries=CACHE_SIZE):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".json"):
+            path = os.path.join(cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass  # evicted concurrently
+    entries.sort()
+    for _, path in entries[:max(len(entries) - max_entries, 0)]:
+        _discard(path)
@@ -0,0 +1,94 @@
+import os
+import re
+import json
+import hashlib
+from collections import namedtuple
+from functools import lru_cache
+
+# JSON file mapping locales to the checks and script ranges that apply to them
+PROFILES_PATH = os.environ.get(
+    "RULE_PROFILES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rule_profiles.json"))
+
+# Compiled per profile: spacing_rules is a list of (pattern, label), checks a frozenset of names
+RuleSet = namedtuple('RuleSet', ['name', 'checks', 'spacing_rules'])
+
+# Bump when the logic of a check changes, so reports cached under older rules are not reused
+CHECKS_REVISION = 1
+
+ALL_CHECKS = (
+    'placeholder_spacing', 'script_spacing', 'punctuation_spacing', 'closing_tag_spacing',
+    'number_word_spacing', 'tags', 'partial_translation', 'double_space', 'acronyms',
+)
+
+_rule_sets = None
+
+def compile_rule_set(name, checks, script_ranges=''):
+    """Compiles the spacing regexes one profile needs, in report order."""
+    rules = []
+    if script_ranges and 'script_spacing' in checks:
+        rules.append((re.compile(f'[{script_ranges}][{{]{{2}}'), "Missing space before placeholder"))
+        rules.append((re.compile(f'[}}]{{2}}[{script_ranges}]'), "Missing space after placeholder"))
+    if 'punctuation_spacing' in checks:
+        rules.append((re.compile(r'[.!?:][^\s{<]'), "Missing space after punctuation"))
+    if 'closing_tag_spacing' in checks:
+        rules.append((re.compile(r'}}[^\s{<]'), "Missing space after closing tag"))
+    if 'number_word_spacing' in checks:
+        rules.append((re.compile(f'\\d[{script_ranges}\\w]'), "Missing space between number and word"))
+    return RuleSet(name, frozenset(checks), rules)
+
+def build_rule_sets(config):
+    """
+    Compiles every profile of a config once. Returns (default, {locale: RuleSet}, version),
+    where the version changes with the config and CHECKS_REVISION.
+    A profile starts from the default checks, then applies its `checks`, `enable`
+    and `disable` lists and its own `script_ranges`.
+    """
+    default = config.get('default', {})
+    default_checks = default.get('checks', [])
+    default_set = compile_rule_set('default', default_checks, default.get('script_ranges', ''))
+
+    by_locale = {}
+    for name, profile in config.get('profiles', {}).items():
+        checks = set(profile.get('checks', default_checks)) | set(profile.get('enable', []))
+        checks -= set(profile.get('disable', []))
+        rule_set = compile_rule_set(name, checks, profile.get('script_ranges', default.get('script_ranges', '')))
+        for locale in profile.get('locales', []):
+            by_locale[locale.lower().replace('_', '-')] = rule_set
+
+    blob = json.dumps(config, sort_keys=True, default=list)
+    version = hashlib.sha1(f"{CHECKS_REVISION}:{blob}".encode('utf-8')).hexdigest()[:12]
+    return default_set, by_locale, version
+
+def load_rule_profiles(path=PROFILES_PATH):
+    if not path or not os.path.exists(path):
+        return build_rule_sets({'default': {'checks': ALL_CHECKS}})
+    with open(path, 'r', encoding='utf-8') as f:
+        return build_rule_sets(json.load(f))
+
+def set_rule_profiles(config):
+    """Replaces the active profiles with an in-memory config and drops cached lookups."""
+    global _rule_sets
+    _rule_sets = build_rule_sets(config)
+    get_rule_set.cache_clear()
+
+def get_rule_sets():
+    global _rule_sets
+    if _rule_sets is None:
+        _rule_sets = load_rule_profiles()
+    return _rule_sets
+
+def rules_version():
+    """Identifies the active rule profiles; part of the key of cached comparison reports."""
+    return get_rule_sets()[2]
+
+@lru_cache(maxsize=1024)
+def get_rule_set(lang=None):
+    """
+    Returns the compiled RuleSet for a detected language ('ta-IN', 'ta', 'tamil', ...),
+    matching the full tag first, then its primary subtag; anything else gets the default.
+    """
+    default, by_locale, _ = get_rule_sets()
+    if not lang:
+        return default
+    lang = lang.lower().replace('_', '-')
+    return by_locale.get(lang) or by_locale.get(lang.split('-', 1)[0]) or default
@@ -1,99 +1,174 @@
 import os
-import json
 import zipfile
-import xml.etree.ElementTree as ET
-import langcodes
 import re
-
-def read_xliff(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    version = root.attrib.get('version')
-    translations = {}
-
-    if version == '1.2':
-        ns = 'urn:oasis:names:tc:xliff:document:1.2'
-        nsmap = {'ns': ns}
-        has_namespace = root.tag.startswith("{")
-
-        def q(tag): return f"{{{ns}}}{tag}" if has_namespace else tag
-
-        file_node = root.find(q("file"))
-        if file_node is None:
-            raise ValueError("❌ XLIFF 1.2: <file> element not found")
-
-        original_name = file_node.attrib.get('original')
-        target_lang = file_node.attrib.get('target-language', 'xx')
-
-        for tu in root.findall(f".//{q('trans-unit')}"):
-            key = tu.attrib.get('resname')
-            if not key:
-                continue
-            tgt = tu.find(q("target"))
-            src = tu.find(q("source"))
-            val = ''.join(tgt.itertext()) if tgt is not None else ''.join(src.itertext()) if src is not None else ''
-            translations[key] = val
-
-    elif version == '2.0':
-        ns = 'urn:oasis:names:tc:xliff:document:2.0'
-        file_node = root.find(f".//{{{ns}}}file")
-        if file_node is None:
-            raise ValueError("❌ XLIFF 2.0: <file> element not found")
-
-        original_name = file_node.attrib.get('id')
-        target_lang = root.attrib.get('trgLang', 'xx')
-
-        for unit in root.findall(f".//{{{ns}}}unit"):
-            key = unit.attrib.get('id')
-            if not key:
-                continue
-            seg = unit.find(f".//{{{ns}}}segment")
-            if seg is None:
-                continue
-            tgt = seg.find(f"{{{ns}}}target")
-            src = seg.find(f"{{{ns}}}source")
-            val = ''.join(tgt.itertext()) if tgt is not None else ''.join(src.itertext()) if src is not None else ''
-            translations[key] = val
-
-    else:
-        raise ValueError(f"❌ Unsupported XLIFF version: {version}")
-
-    return translations, original_name, target_lang
-
-def write_output(translations, original_name, lang_code, output_dir):
-    # 🧹 Clean original filename
+from language_meta import language_name
+from checkpoints import xliff_digest
+from final_compare import compare_files
+from xliff_io import expand_keymap, iter_xliff_files, load_keymap
+from bundle_merge import find_base_bundle
+from formats import get_format
+from tep_preprocess import load_snapshot
+
+def output_name(original_name, lang_code):
+    """Delivered file name of a bundle in one language: messages_en.json -> messages-French.json."""
     base_name = os.path.splitext(os.path.basename(original_name))[0]
     ext = os.path.splitext(original_name)[1].lower()
+    # 🧹 Clean original filename
     base_name = re.sub(r'[-_](en|[a-z]{2}(?:-[A-Z]{2})?)$', '', base_name, flags=re.IGNORECASE)
-
     # 🏷 Language formatting
-    lang_name = langcodes.get(lang_code).language_name().title()
+    return f"{base_name}-{language_name(lang_code)}{ext}"
+
+def drop_removed_keys(bundle_format, path, keep_keys, lang_code):
+    """Rewrites a merged delta bundle without the keys no longer in the source."""
+    data = bundle_format.read(path, raw=False)
+    if all(key in keep_keys for key in data):
+        return
+    bundle_format.write({key: value for key, value in data.items() if key in keep_keys}, path, lang=lang_code)
+
+def write_output(translations, original_name, lang_code, output_dir, base_dir=None, sources=None,
+                 keep_keys=None):
+    """
+    Writes one bundle, patching the delivered one from `base_dir` when there is one.
+    With `keep_keys` (a delta merge), keys not among them are dropped from the result.
+    """
+    ext = os.path.splitext(original_name)[1].lower()
+    bundle_format = get_format(original_name)
+    if bundle_format is None:
+        print(f"⚠️ Unsupported extension: {ext}")
+        return None
+
     lang_folder = os.path.join(output_dir, lang_code)
     os.makedirs(lang_folder, exist_ok=True)
 
-    renamed_file = f"{base_name}-{lang_name}{ext}"
+    renamed_file = output_name(original_name, lang_code)
     output_path = os.path.join(lang_folder, renamed_file)
 
-    if ext == ".json":
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(translations, f, indent=4, ensure_ascii=False)
-
-    elif ext == ".properties":
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for k, v in translations.items():
-                cleaned_val = v.replace('\n', '\\n').replace('=', '\\=').replace(':', '\\:')
-                f.write(f"{k}={cleaned_val}\n")
+    # 🔀 Patch the previously delivered bundle in place when one was supplied
+    base_path = find_base_bundle(base_dir, lang_code, renamed_file) if base_dir else None
+    if base_path:
+        bundle_format.merge(base_path, translations, output_path, sources=sources, lang=lang_code)
+    else:
+        bundle_format.write(translations, output_path, sources=sources, lang=lang_code)
+    if keep_keys is not None:
+        drop_removed_keys(bundle_format, output_path, keep_keys, lang_code)
 
     return os.path.relpath(output_path, output_dir)
 
-def run_tep_postprocessing(input_dir, output_dir):
-    renamed_files = []
+def missing_base_error(base_dir, original_name, lang_code):
+    """The error for a delta bundle with no previous bundle to merge into, else None."""
+    renamed_file = output_name(original_name, lang_code)
+    if find_base_bundle(base_dir, lang_code, renamed_file):
+        return None
+    return f"❌ {lang_code}/{renamed_file} is not in the previous bundles ZIP, so {original_name} cannot be delivered in full"
+
+def base_languages(base_dir, snapshot):
+    """
+    Top-level folders of the base ZIP that are language codes holding at least one
+    bundle of the snapshot; __MACOSX/, wrapper folders and the like are skipped.
+    """
+    languages = set()
+    for name in os.listdir(base_dir):
+        if not os.path.isdir(os.path.join(base_dir, name)):
+            continue
+        try:
+            language_name(name)
+        except Exception:
+            continue
+        if any(os.path.isfile(os.path.join(base_dir, name, output_name(original_name, name)))
+               for original_name in snapshot):
+            languages.add(name)
+    return languages
+
+def copy_unchanged_bundles(snapshot, languages, output_dir, base_dir, errors):
+    """
+    Delta XLIFFs only cover bundles with new or changed keys; every other bundle of the
+    snapshot is carried over from `base_dir` (minus removed keys) for each language.
+    Bundles the base ZIP does not have are reported in `errors`.
+    """
+    copied = []
+    for original_name, hashes in sorted(snapshot.items()):
+        for lang_code in sorted(languages):
+            if os.path.exists(os.path.join(output_dir, lang_code, output_name(original_name, lang_code))):
+                continue
+            error = missing_base_error(base_dir, original_name, lang_code)
+            if error:
+                if error not in errors:  # not already reported for its XLIFF
+                    errors.append(error)
+                continue
+            rel_path = write_output({}, original_name, lang_code, output_dir, base_dir=base_dir,
+                                    keep_keys=set(hashes))
+            if rel_path:
+                copied.append(rel_path)
+    return copied
+
+def run_tep_postprocessing(input_dir, output_dir, base_dir=None, qa_rows=None, checkpoint=None,
+                           snapshot_path=None):
+    """
+    Converts translated XLIFFs back into bundles. When `qa_rows` is a list, the
+    final-compare rules run on each file's in-memory source/target pairs and the
+    issue rows are appended to it, so no separate comparison upload is needed.
+    With a `checkpoint`, XLIFFs converted by an interrupted run of the same job are skipped.
+
+    With `snapshot_path` (the snapshot.json written by delta preprocessing) the XLIFFs
+    are deltas: they are merged into the previous bundles of `base_dir`, which is then
+    required, keys missing from the snapshot are dropped, and bundles without an XLIFF
+    are carried over, so the output is the full release. A bundle the base ZIP does
+    not have is not written, since it would only hold the delta keys.
+
+    Returns the errors of the run.
+    """
+    snapshot = load_snapshot(snapshot_path) if snapshot_path else None
+    if snapshot is not None and not base_dir:
+        raise ValueError("❌ Delta postprocessing needs the ZIP of previous target bundles to merge into")
+    languages = set()
+    errors = []
     for filename in os.listdir(input_dir):
         if filename.endswith('.xliff'):
             xliff_path = os.path.join(input_dir, filename)
-            translations, original_name, target_lang = read_xliff(xliff_path)
-            rel_path = write_output(translations, original_name, target_lang, output_dir)
-            renamed_files.append(rel_path)
+            if checkpoint is not None:
+                input_hash = xliff_digest(xliff_path)
+                if checkpoint.is_done(filename, input_hash):
+                    done = checkpoint.result(filename)  # ⏭️ converted by an earlier run
+                    errors.extend(done.get("errors", []))
+                    languages.update(os.path.normpath(p).split(os.sep)[0] for p in done["files"])
+                    if qa_rows is not None:
+                        qa_rows.extend(done["qa"])
+                    continue
+
+            file_outputs, file_rows, file_errors = [], [], []
+            keymaps = load_keymap(xliff_path)  # present when preprocessing deduplicated strings
+            # 📦 Package XLIFFs carry several <file> elements; each becomes its own bundle
+            for translations, original_name, target_lang, sources in iter_xliff_files(xliff_path):
+                if original_name in keymaps:
+                    translations = expand_keymap(translations, keymaps[original_name])
+                    sources = expand_keymap(sources, keymaps[original_name])
+                languages.add(target_lang)
+                keep_keys = None
+                if snapshot is not None:
+                    error = missing_base_error(base_dir, original_name, target_lang)
+                    if error:
+                        file_errors.append(error)
+                        continue
+                    keep_keys = set(snapshot[original_name]) if original_name in snapshot else None
+                rel_path = write_output(translations, original_name, target_lang, output_dir, base_dir=base_dir,
+                                        sources=sources, keep_keys=keep_keys)
+                if not rel_path:
+                    continue
+                file_outputs.append(rel_path)
+                if qa_rows is not None:
+                    file_rows.extend(compare_files(sources, translations, target_lang, os.path.basename(rel_path)))
+
+            errors.extend(file_errors)
+            if qa_rows is not None:
+                qa_rows.extend(file_rows)
+            if checkpoint is not None:
+                checkpoint.complete(filename, input_hash, [os.path.join(output_dir, p) for p in file_outputs],
+                                    {"files": file_outputs, "qa": file_rows, "errors": file_errors})
+
+    if snapshot is not None:
+        # Language folders of the base ZIP count too, for a delta with no XLIFF of theirs
+        languages.update(base_languages(base_dir, snapshot))
+        copy_unchanged_bundles(snapshot, languages, output_dir, base_dir, errors)
 
     zip_path = os.path.join(output_dir, "batch.zip")
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
@@ -104,4 +179,4 @@ def run_tep_postprocessing(input_dir, output_dir):
                     arcname = os.path.relpath(full_path, output_dir)
                     zipf.write(full_path, arcname)
 
-    return renamed_files
+    return errors
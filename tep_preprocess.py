@@ -1,76 +1,109 @@
 import os
-import re
-import xml.etree.ElementTree as ET
-
-def read_json_raw(file_path):
-    raw_lines = {}
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            match = re.match(r'\s*"([^"]+)"\s*:\s*"((?:[^"\\]|\\.)*)"\s*,?\s*$', line)
-            if match:
-                key, val = match.groups()
-                raw_lines[key] = val
-    return raw_lines
-
-def read_properties(file_path):
-    data = {}
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#') and '=' in line:
-                key, val = line.split('=', 1)
-                data[key.strip()] = val.strip()
-    return data
-
-def write_xliff(data, input_file, output_file, src_lang='en', tgt_lang='fr', version='1.2'):
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-
-    if version == '1.2':
-        xliff = ET.Element('xliff', {'version': '1.2'})
-        file_tag = ET.SubElement(xliff, 'file', {
-            'source-language': src_lang,
-            'target-language': tgt_lang,
-            'datatype': 'plaintext',
-            'original': os.path.basename(input_file)
-        })
-        body = ET.SubElement(file_tag, 'body')
-        for i, (key, value) in enumerate(data.items(), start=1):
-            tu = ET.SubElement(body, 'trans-unit', {'id': str(i), 'resname': key})
-            ET.SubElement(tu, 'source').text = value
-            ET.SubElement(tu, 'target').text = ''
-        tree = ET.ElementTree(xliff)
-
-    elif version == '2.0':
-        ns = "urn:oasis:names:tc:xliff:document:2.0"
-        ET.register_namespace('', ns)
-        xliff = ET.Element(f'{{{ns}}}xliff', {
-            'version': '2.0',
-            'srcLang': src_lang,
-            'trgLang': tgt_lang
-        })
-        file_tag = ET.SubElement(xliff, f'{{{ns}}}file', {
-            'id': os.path.basename(input_file)
-        })
-        for i, (key, value) in enumerate(data.items(), start=1):
-            unit = ET.SubElement(file_tag, f'{{{ns}}}unit', {'id': str(i)})
-            segment = ET.SubElement(unit, f'{{{ns}}}segment')
-            ET.SubElement(segment, f'{{{ns}}}source').text = value
-            ET.SubElement(segment, f'{{{ns}}}target').text = ''
-        tree = ET.ElementTree(xliff)
-
-    else:
-        raise ValueError("Unsupported XLIFF version. Use '1.2' or '2.0'.")
-
-    tree.write(output_file, encoding='utf-8', xml_declaration=True)
-
-def run_tep_preprocessing(input_dir, output_dir, version='1.2'):
-    for filename in os.listdir(input_dir):
+import json
+import hashlib
+from checkpoints import file_digest
+from formats import get_format
+from xliff_io import PACKAGE_NAME, dedup_units, keymap_path, save_keymap, write_xliff_package
+
+SNAPSHOT_NAME = "snapshot.json"
+
+def hash_value(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+def build_snapshot(data):
+    return {key: hash_value(value) for key, value in data.items()}
+
+def load_snapshot(snapshot_path):
+    """Loads the per-file key hashes of the previous release ({} when there is none)."""
+    if not snapshot_path or not os.path.exists(snapshot_path):
+        return {}
+    with open(snapshot_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_snapshot(snapshot, snapshot_path):
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    with open(snapshot_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=2, sort_keys=True)
+
+def filter_delta(data, previous_hashes):
+    """Keeps only keys that are new or whose source text changed since the snapshot."""
+    return {
+        key: value for key, value in data.items()
+        if previous_hashes.get(key) != hash_value(value)
+    }
+
+def run_tep_preprocessing(input_dir, output_dir, version='1.2', delta=False, snapshot_path=None,
+                          single_file=False, tgt_lang='fr', dedup=False, inline_codes=False, checkpoint=None):
+    """
+    Writes one XLIFF per source bundle, or with `single_file` one package XLIFF holding
+    a <file> element per bundle. In delta mode only keys added or changed since the
+    snapshot at `snapshot_path` are exported, and a fresh snapshot.json for the next
+    release is written next to the XLIFFs. With `dedup`, repeated source strings
+    become one unit each and a .keymap.json sidecar records which keys share it.
+    With `inline_codes`, placeholders and tags are protected as XLIFF <ph> codes.
+    Plural messages get a unit for every form `tgt_lang` needs.
+    With a `checkpoint`, bundles whose XLIFF was already written by an interrupted
+    run of the same job are skipped.
+    Returns the errors of bundles that could not be read; the other bundles are
+    still exported.
+    """
+    previous = load_snapshot(snapshot_path) if delta else {}
+    errors = []
+    snapshot = {}
+    package = []
+    keymaps = {}
+
+    for filename in sorted(os.listdir(input_dir)):
         full_path = os.path.join(input_dir, filename)
-        base, ext = os.path.splitext(filename)
-        if ext.lower() == '.json':
-            data = read_json_raw(full_path)
-        elif ext.lower() == '.properties':
-            data = read_properties(full_path)
-        else:
+        base = os.path.splitext(filename)[0]
+        bundle_format = get_format(filename)
+        if bundle_format is None:
             continue
+
+        done = False
+        if checkpoint is not None and not single_file:
+            unit, input_hash = f"{filename}|{tgt_lang}", file_digest(full_path)
+            done = checkpoint.is_done(unit, input_hash)
+            if done and not delta:
+                continue  # ⏭️ written by an earlier run of this job
+
+        try:
+            data = bundle_format.expand_plurals(bundle_format.read(full_path), tgt_lang)
+        except Exception as e:
+            errors.append(f"❌ {bundle_format.label} read error in {filename}: {str(e)}")
+            continue
+
+        if delta:
+            snapshot[filename] = build_snapshot(data)
+            data = filter_delta(data, previous.get(filename, {}))
+            if not data or done:
+                continue
+
+        units = [(key, value, '') for key, value in data.items()]
+        if dedup:
+            units, keymaps[filename] = dedup_units(units)
+
+        if single_file:
+            package.append((filename, units))
+            continue
+
         output_file = os.path.join(output_dir, f"{base}.xliff")
-        write_xliff(data, full_path, output_file, version=version)
+        write_xliff_package([(filename, units)], output_file, tgt_lang=tgt_lang, version=version,
+                            inline_codes=inline_codes)
+        if dedup:
+            save_keymap({filename: keymaps[filename]}, output_file)
+        if checkpoint is not None:
+            outputs = [output_file, keymap_path(output_file)] if dedup else [output_file]
+            checkpoint.complete(unit, input_hash, outputs)
+
+    if package:
+        output_file = os.path.join(output_dir, PACKAGE_NAME.format(lang=tgt_lang))
+        write_xliff_package(package, output_file, tgt_lang=tgt_lang, version=version,
+                            inline_codes=inline_codes)
+        if dedup:
+            save_keymap(keymaps, output_file)
+
+    if delta:
+        save_snapshot(snapshot, os.path.join(output_dir, SNAPSHOT_NAME))
+
+    return errors
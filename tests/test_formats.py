@@ -0,0 +1,140 @@
+import gettext
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formats import get_format, write_mo
+
+ANDROID_MIXED = """<?xml version="1.0" encoding="utf-8"?>
+<resources>
+    <string-array name="days">
+        <item>Mon</item>
+        <item>Tue</item>
+    </string-array>
+    <string name="hello">Hello</string>
+    <plurals name="files">
+        <item quantity="one">%d file</item>
+        <item quantity="other">%d files</item>
+    </plurals>
+    <string name="bye">Bye</string>
+</resources>
+"""
+
+RU_HEADER = ("Language: ru\nContent-Type: text/plain; charset=UTF-8\n"
+             "Plural-Forms: nplurals=3; plural=(n%10==1 && n%100!=11 ? 0 : "
+             "n%10>=2 && n%10<=4 && (n%100<10 || n%100>=20) ? 1 : 2);\n")
+
+def test_android_merge_mixed_elements(tmp_path):
+    base = tmp_path / "strings.xml"
+    base.write_text(ANDROID_MIXED, encoding="utf-8")
+    out = tmp_path / "out.xml"
+    android = get_format(str(base))
+    android.merge(str(base), {'hello': 'Bonjour', 'days[0]': 'Lun', 'files[other]': '%d fichiers'}, str(out))
+
+    text = out.read_text(encoding="utf-8")
+    assert text.count('name="hello"') == 1
+    assert text.count('name="days"') == 1
+    assert android.read(str(out)) == {
+        'days[0]': 'Lun', 'days[1]': 'Tue', 'hello': 'Bonjour',
+        'files[one]': '%d file', 'files[other]': '%d fichiers', 'bye': 'Bye',
+    }
+
+def test_mo_merge_keeps_header(tmp_path):
+    base = tmp_path / "base.mo"
+    write_mo([(None, 'file', 'files', {0: 'файл', 1: 'файла', 2: 'файлов'}),
+              (None, 'Hello', None, {0: 'Привет'})], str(base), RU_HEADER)
+    out = tmp_path / "out.mo"
+    get_format(str(base)).merge(str(base), {'Hello': 'Здравствуйте'}, str(out))
+
+    with open(out, 'rb') as f:
+        catalog = gettext.GNUTranslations(f)
+    assert catalog.ngettext('file', 'files', 5) == 'файлов'
+    assert catalog.gettext('Hello') == 'Здравствуйте'
+
+def test_po_write_uses_target_plural_forms(tmp_path):
+    path = tmp_path / "messages.po"
+    get_format(str(path)).write({'file[0]': 'файл', 'file[1]': 'файла', 'file[2]': 'файлов'}, str(path),
+                                sources={'file[1]': 'files'}, lang='ru')
+    text = path.read_text(encoding="utf-8")
+    assert '"Language: ru\\n"' in text
+    assert 'nplurals=3' in text
+
+def test_gettext_keys_with_double_colon(tmp_path):
+    source = tmp_path / "source.po"
+    source.write_text('msgid "std::string"\nmsgstr ""\n\n'
+                      'msgctxt "a:b"\nmsgid "Open"\nmsgstr ""\n\n'
+                      'msgid "Page [2]"\nmsgstr ""\n', encoding="utf-8")
+    data = get_format(str(source)).read(str(source))
+    assert len(data) == 3
+
+    for name in ("messages.po", "messages.mo"):
+        path = tmp_path / name
+        bundle_format = get_format(str(path))
+        bundle_format.write(data, str(path))
+        assert bundle_format.read(str(path)) == data
+
+    text = (tmp_path / "messages.po").read_text(encoding="utf-8")
+    assert 'msgid "std::string"' in text
+    assert 'msgctxt "a:b"\nmsgid "Open"' in text
+    assert 'msgid "Page [2]"' in text
+
+RAILS_YAML = """fr:
+  date:
+    day_names:
+    - Sunday
+    - Monday
+  nav:
+    home: Home
+"""
+
+def test_yaml_sequences_round_trip(tmp_path):
+    base = tmp_path / "fr.yml"
+    base.write_text(RAILS_YAML, encoding="utf-8")
+    yaml_format = get_format(str(base))
+    assert yaml_format.read(str(base)) == {
+        'date.day_names.0': 'Sunday', 'date.day_names.1': 'Monday', 'nav.home': 'Home'}
+
+    merged = tmp_path / "merged.yml"
+    yaml_format.merge(str(base), {'date.day_names.0': 'Dimanche', 'nav.back': 'Retour'}, str(merged))
+    assert merged.read_text(encoding="utf-8").startswith("fr:\n")
+    assert yaml_format.read(str(merged)) == {
+        'date.day_names.0': 'Dimanche', 'date.day_names.1': 'Monday', 'nav.home': 'Home', 'nav.back': 'Retour'}
+
+    written = tmp_path / "written.yml"
+    yaml_format.write(yaml_format.read(str(merged)), str(written), lang='fr')
+    text = written.read_text(encoding="utf-8")
+    assert text.startswith("fr:\n") and "- Dimanche" in text
+    assert yaml_format.read(str(written)) == yaml_format.read(str(merged))
+
+def test_yaml_locale_root_only_when_sole_key(tmp_path):
+    yaml_format = get_format("x.yml")
+    sole = tmp_path / "sole.yml"
+    sole.write_text("id:\n  label: ID\n", encoding="utf-8")
+    assert yaml_format.read(str(sole)) == {'label': 'ID'}
+
+    mixed = tmp_path / "mixed.yml"
+    mixed.write_text("id:\n  label: ID\nok: OK\n", encoding="utf-8")
+    assert yaml_format.read(str(mixed)) == {'id.label': 'ID', 'ok': 'OK'}
+
+    merged = tmp_path / "merged.yml"
+    yaml_format.merge(str(mixed), {'new': 'Nouveau', 'id.label': 'Identifiant'}, str(merged))
+    assert yaml_format.read(str(merged)) == {'id.label': 'Identifiant', 'ok': 'OK', 'new': 'Nouveau'}
+
+def test_plural_forms_follow_target_language(tmp_path):
+    source = tmp_path / "messages.pot"
+    source.write_text('msgid "file"\nmsgid_plural "files"\nmsgstr[0] ""\nmsgstr[1] ""\n', encoding="utf-8")
+    po_format = get_format(str(source))
+    data = po_format.expand_plurals(po_format.read(str(source)), 'ru')
+    assert data == {'file[0]': 'file', 'file[1]': 'files', 'file[2]': 'files'}
+
+    translated = {'file[0]': 'файл', 'file[1]': 'файла'}
+    po_path = tmp_path / "messages.po"
+    po_format.write(translated, str(po_path), lang='ru')
+    assert 'msgstr[2] "файла"' in po_path.read_text(encoding="utf-8")
+
+    mo_path = tmp_path / "messages.mo"
+    get_format(str(mo_path)).write(translated, str(mo_path), lang='ru')
+    with open(mo_path, 'rb') as f:
+        catalog = gettext.GNUTranslations(f)
+    assert catalog.ngettext('file', 'files', 5) == 'файла'
@@ -0,0 +1,23 @@
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xliff_io import XLIFF_20_NS, iter_xliff_files, write_xliff_package
+
+def test_repeated_inline_codes_get_unique_ids(tmp_path):
+    units = [('k', '{0} and {0} or {1}', '{1} et {0} puis {0}')]
+    for version in ('1.2', '2.0'):
+        path = tmp_path / f"package-{version}.xliff"
+        write_xliff_package([('a.properties', units)], str(path), version=version, inline_codes=True)
+
+        root = ET.parse(path).getroot()
+        sources = root.findall('.//{*}source')
+        assert [ph.get('id') for ph in sources[0].iter() if ph.tag.endswith('ph')] == ['1', '2', '3']
+        if version == '2.0':
+            assert len(root.findall(f'.//{{{XLIFF_20_NS}}}data')) == 2
+
+        [(translations, _, _, read_sources)] = iter_xliff_files(str(path))
+        assert translations == {'k': '{1} et {0} puis {0}'}
+        assert read_sources == {'k': '{0} and {0} or {1}'}
@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+MB = 1024 * 1024
+
+# Uploaded files stay in memory up to this size, then spill to a temp file
+SPOOL_MAX_MEMORY = int(os.environ.get("UPLOAD_SPOOL_MAX_MEMORY_MB", "1")) * MB
+# Whole-request cap; requests announcing more are rejected before the body is read
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "200")) * MB
+# Cap on the uncompressed size of an uploaded ZIP (guards against zip bombs)
+MAX_EXTRACTED_BYTES = int(os.environ.get("MAX_EXTRACTED_MB", "1024")) * MB
+
+CHUNK_SIZE = 64 * 1024
+
+class UploadTooLarge(ValueError):
+    pass
+
+def spooled_stream():
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode='rb+')
+
+def upload_stream(file):
+    """Returns the seekable stream behind a FileStorage (or the object itself), rewound."""
+    stream = getattr(file, 'stream', file)
+    stream.seek(0)
+    return stream
+
+def save_upload(file, path):
+    """Copies an upload to `path` in fixed-size chunks."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as out:
+        shutil.copyfileobj(upload_stream(file), out, CHUNK_SIZE)
+    return path
+
+def extract_zip_upload(file, dest_dir, max_bytes=MAX_EXTRACTED_BYTES):
+    """
+    Extracts an uploaded ZIP straight from its spooled stream, without saving the
+    archive first. The declared uncompressed size is checked before anything is written.
+    """
+    with zipfile.ZipFile(upload_stream(file), 'r') as zip_ref:
+        total = sum(info.file_size for info in zip_ref.infolist())
+        if total > max_bytes:
+            raise UploadTooLarge(
+                f"❌ ZIP expands to {total // MB} MB, above the {max_bytes // MB} MB limit")
+        os.makedirs(dest_dir, exist_ok=True)
+        zip_ref.extractall(dest_dir)
+    return dest_dir
@@ -0,0 +1,122 @@
+import numpy as np
+from key_alignment import align_keys
+from rule_profiles import get_rule_set
+from final_compare import (
+    PLACEHOLDER_PATTERN, DOUBLE_SPACE_PATTERN, analyze_source,
+    check_tag_mismatch, check_partial_translation, check_acronym_mismatch,
+    placeholder_spacing_issues,
+)
+
+def compare_files_vectorized(source_data, translated_data, lang, file_name, source_analysis=None):
+    """
+    Batch backend for compare_files. Missing/extra keys, untranslated values, double
+    spaces, spacing rules and placeholder counts are evaluated as pandas column
+    operations over the whole bundle; only rows that can fail an expensive check
+    (placeholder sets and spacing, tags, similarity, acronyms) drop to per-row Python.
+    Produces the same rows as compare_files, under the same rule profile.
+    """
+    import pandas as pd  # only loaded when this backend is selected
+
+    rules = get_rule_set(lang)
+    checks = rules.checks
+
+    if source_analysis is None:
+        source_analysis = analyze_source(source_data)
+
+    alignment = align_keys(source_data, translated_data)
+    s = pd.Series([source_data[k] for k in alignment.common], index=alignment.common, dtype=object)
+    t = pd.Series([translated_data[k] for k in alignment.common], index=alignment.common, dtype=object)
+    src_is_str = s.map(lambda v: isinstance(v, str))
+    tgt_is_str = t.map(lambda v: isinstance(v, str))
+    type_mismatch = src_is_str != tgt_is_str
+
+    ss = s[~type_mismatch].astype(str)
+    ts = t[~type_mismatch].astype(str)
+    analysis = pd.Series([source_analysis[k] for k in ss.index], index=ss.index, dtype=object)
+
+    untranslated = ss == ts
+    src_ph_count = analysis.map(lambda a: len(a.placeholders))
+    tgt_ph_count = ts.str.count(PLACEHOLDER_PATTERN.pattern)
+
+    # Both sides without placeholders always agree; only the rest need set comparison
+    ph_candidates = (~untranslated & ((src_ph_count > 0) | (tgt_ph_count > 0))).to_numpy()
+
+    rule_hits = [(label, ts.str.contains(pattern.pattern, regex=True).to_numpy())
+                 for pattern, label in rules.spacing_rules]
+    none = np.zeros(len(ts), dtype=bool)
+    if 'tags' in checks:
+        tag_candidates = (analysis.map(lambda a: bool(a.tags)) | ts.str.contains('<', regex=False)).to_numpy()
+    else:
+        tag_candidates = none
+    if 'partial_translation' in checks:
+        src_len, tgt_len = ss.str.len(), ts.str.len()
+        # SequenceMatcher.ratio() never exceeds 2*min/(sum of lengths), so skip rows that cannot reach 0.7
+        length_bound = 2 * src_len.where(src_len < tgt_len, tgt_len) / (src_len + tgt_len)
+        partial_candidates = (~untranslated & (src_len > 10) & (tgt_len > 10) & (length_bound >= 0.7)).to_numpy()
+    else:
+        partial_candidates = none
+    if 'double_space' in checks:
+        double_space = ts.str.contains(DOUBLE_SPACE_PATTERN.pattern, regex=True).to_numpy()
+    else:
+        double_space = none
+    untranslated = untranslated.to_numpy()
+    placeholder_spacing = 'placeholder_spacing' in checks
+    acronyms = 'acronyms' in checks
+
+    issues_by_key = {}
+    rows = zip(ss.index, ss.to_numpy(), ts.to_numpy(), analysis.to_numpy())
+    for i, (key, src_str, tgt_str, a) in enumerate(rows):
+        issues = []
+        if untranslated[i]:
+            issues.append(("Untranslated Key", "Source and target values are identical."))
+        elif ph_candidates[i] and a.placeholder_set != set(PLACEHOLDER_PATTERN.findall(tgt_str)):
+            issues.append(("Placeholder Mismatch", "Mismatch in placeholder usage."))
+        else:
+            spacing = placeholder_spacing_issues(tgt_str, a.placeholders) if placeholder_spacing and a.placeholders else []
+            spacing.extend(("Spacing Mismatch", label) for label, hits in rule_hits if hits[i])
+            issues.extend(dict.fromkeys(spacing))
+
+        if tag_candidates[i]:
+            issues.extend(check_tag_mismatch(src_str, tgt_str, a.tags))
+        if partial_candidates[i]:
+            issues.extend(check_partial_translation(src_str, tgt_str))
+        if double_space[i]:
+            issues.append(("Formatting Issue", "Double spaces found in translation."))
+        if acronyms and a.acronyms:
+            issues.extend(check_acronym_mismatch(src_str, tgt_str, a.acronyms))
+        issues_by_key[key] = issues
+
+    for key in s.index[type_mismatch]:
+        issues_by_key[key] = [("Quote Structure Mismatch", "Source and target value types do not match.")]
+
+    report_data = []
+
+    def add_rows(key, issues):
+        for issue_type, detail in issues:
+            report_data.append({
+                "File Name": file_name,
+                "Language": lang,
+                "Issue Type": issue_type,
+                "Key": key,
+                "Source": source_data.get(key, ""),
+                "Target": translated_data.get(key, ""),
+                "Details": detail
+            })
+
+    for key in alignment.missing:
+        issues_by_key[key] = [("Missing Key", "Key is present in source but missing in target.")]
+    for key in alignment.extra:
+        issues_by_key[key] = [("Extra Key", "Key is present in target but missing in source.")]
+
+    for key in alignment.ordered:
+        add_rows(key, issues_by_key[key])
+
+    if not report_data:
+        report_data.append({
+            "File Name": file_name,
+            "Language": lang,
+            "Issue Type": "No issues found",
+            "Key": "", "Source": "", "Target": "", "Details": ""
+        })
+
+    return report_data
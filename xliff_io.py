@@ -0,0 +1,249 @@
+import os
+import json
+import xml.etree.ElementTree as ET
+from placeholders import tokenize
+
+XLIFF_12_NS = "urn:oasis:names:tc:xliff:document:1.2"
+XLIFF_20_NS = "urn:oasis:names:tc:xliff:document:2.0"
+
+PACKAGE_NAME = "package-{lang}.xliff"
+KEYMAP_SUFFIX = ".keymap.json"
+
+def _set_content(elem, text, inline_codes, ph_ids, data=None, ns=''):
+    """
+    Sets the text of a <source>/<target>. With `inline_codes`, placeholders become
+    protected <ph> codes: in 1.2 the native code is the <ph> content, in 2.0 it is
+    stored in the unit's <originalData> (`data`) and referenced by dataRef.
+    Every occurrence of a code gets its own id; the n-th occurrence of a code in the
+    target reuses the id of its n-th occurrence in the source (`ph_ids` maps each code
+    to those ids). In 2.0 all occurrences of a code share one <data> entry.
+    """
+    if not inline_codes:
+        elem.text = text
+        return
+
+    seen = {}
+    last = None
+    for chunk, is_placeholder in tokenize(text):
+        if not is_placeholder:
+            if last is None:
+                elem.text = (elem.text or '') + chunk
+            else:
+                last.tail = (last.tail or '') + chunk
+            continue
+
+        ids = ph_ids.setdefault(chunk, [])
+        occurrence = seen[chunk] = seen.get(chunk, 0) + 1
+        if occurrence > len(ids):
+            ids.append(str(sum(len(i) for i in ph_ids.values()) + 1))
+        ph_id = ids[occurrence - 1]
+        if data is None:
+            last = ET.SubElement(elem, 'ph', {'id': ph_id})
+            last.text = chunk
+        else:
+            data_ref = f'd{ids[0]}'
+            data[data_ref] = chunk
+            last = ET.SubElement(elem, f'{{{ns}}}ph', {'id': ph_id, 'dataRef': data_ref, 'disp': chunk})
+
+def write_xliff_package(files, output_file, src_lang='en', tgt_lang='fr', version='1.2', inline_codes=False):
+    """
+    Writes one XLIFF document with a <file> element per resource bundle.
+    `files` is a list of (original_name, units) where units are (key, source, target).
+    A single-entry list produces the classic one-bundle-per-XLIFF layout.
+    With `inline_codes`, placeholders are written as <ph> inline codes.
+    """
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+
+    if version == '1.2':
+        xliff = ET.Element('xliff', {'version': '1.2'})
+        for original_name, units in files:
+            file_tag = ET.SubElement(xliff, 'file', {
+                'source-language': src_lang,
+                'target-language': tgt_lang,
+                'datatype': 'plaintext',
+                'original': original_name
+            })
+            body = ET.SubElement(file_tag, 'body')
+            for i, (key, source, target) in enumerate(units, start=1):
+                tu = ET.SubElement(body, 'trans-unit', {'id': str(i), 'resname': key})
+                ph_ids = {}
+                _set_content(ET.SubElement(tu, 'source'), source, inline_codes, ph_ids)
+                _set_content(ET.SubElement(tu, 'target'), target, inline_codes, ph_ids)
+
+    elif version == '2.0':
+        ns = XLIFF_20_NS
+        ET.register_namespace('', ns)
+        xliff = ET.Element(f'{{{ns}}}xliff', {
+            'version': '2.0',
+            'srcLang': src_lang,
+            'trgLang': tgt_lang
+        })
+        for original_name, units in files:
+            file_tag = ET.SubElement(xliff, f'{{{ns}}}file', {'id': original_name})
+            for i, (key, source, target) in enumerate(units, start=1):
+                # 2.0 unit ids must be NMTOKENs, so the resource key travels in `name`
+                unit = ET.SubElement(file_tag, f'{{{ns}}}unit', {'id': str(i), 'name': key})
+                segment = ET.SubElement(unit, f'{{{ns}}}segment')
+                ph_ids, data = {}, {}
+                _set_content(ET.SubElement(segment, f'{{{ns}}}source'), source, inline_codes, ph_ids, data, ns)
+                _set_content(ET.SubElement(segment, f'{{{ns}}}target'), target, inline_codes, ph_ids, data, ns)
+                if data:
+                    original_data = ET.Element(f'{{{ns}}}originalData')
+                    for data_id, code in data.items():
+                        ET.SubElement(original_data, f'{{{ns}}}data', {'id': data_id}).text = code
+                    unit.insert(0, original_data)
+
+    else:
+        raise ValueError("❌ Unsupported XLIFF version. Use '1.2' or '2.0'.")
+
+    ET.ElementTree(xliff).write(output_file, encoding='utf-8', xml_declaration=True)
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _text(elem, data=None):
+    """
+    Returns the plain text of a <source>/<target>, restoring inline codes to their
+    native form. `data` is the 2.0 unit's originalData map (None for 1.2).
+    """
+    if elem is None:
+        return None
+
+    parts = [elem.text or '']
+    for child in elem:
+        name = _local(child.tag)
+        if data is not None and name in ('ph', 'sc', 'ec'):
+            attrs = child.attrib
+            parts.append(data.get(attrs.get('dataRef'), attrs.get('equiv', attrs.get('disp', ''))))
+        elif data is not None and name == 'pc':
+            parts.append(data.get(child.attrib.get('dataRefStart'), ''))
+            parts.append(_text(child, data))
+            parts.append(data.get(child.attrib.get('dataRefEnd'), ''))
+        elif name in ('ph', 'bpt', 'ept', 'it'):
+            parts.append(''.join(child.itertext()))  # 1.2 codes wrap their native text
+        elif name in ('x', 'bx', 'ex'):
+            parts.append(child.attrib.get('equiv-text', ''))
+        else:
+            parts.append(_text(child, data))  # <g>, <mrk>, ... keep their content
+        parts.append(child.tail or '')
+    return ''.join(parts)
+
+def _child(elem, name):
+    for child in elem:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+def _unit_texts(unit):
+    """Joins the source/target text of all <segment>/<ignorable> parts of a 2.0 unit."""
+    original_data = _child(unit, 'originalData')
+    data = {d.attrib.get('id'): d.text or '' for d in original_data} if original_data is not None else {}
+
+    sources, targets = [], []
+    has_target = False
+    for part in unit:
+        if _local(part.tag) not in ('segment', 'ignorable'):
+            continue
+        source = _text(_child(part, 'source'), data) or ''
+        target = _text(_child(part, 'target'), data)
+        has_target = has_target or target is not None
+        sources.append(source)
+        targets.append(source if target is None else target)
+    if not sources:
+        return None, None
+    return ''.join(sources), ''.join(targets) if has_target else None
+
+def iter_xliff_files(file_path, fallback_to_source=False):
+    """
+    Streams an XLIFF 1.2 or 2.0 document and yields (translations, original_name,
+    target_lang, sources) for every <file> element, so multi-file packages are split
+    in a single pass. Units are cleared as soon as they are read.
+
+    Keys come from `resname` (1.2) or `name` (2.0), falling back to the 2.0 unit `id`
+    for files written before keys were carried.
+
+    With `fallback_to_source`, an empty <target> takes the <source> text; otherwise
+    only a missing <target> does.
+    """
+    version = None
+    target_lang = 'xx'
+    original_name = None
+    translations = {}
+    sources = {}
+
+    for event, elem in ET.iterparse(file_path, events=('start', 'end')):
+        name = _local(elem.tag)
+
+        if event == 'start':
+            if name == 'xliff':
+                version = elem.attrib.get('version') or ('2.0' if XLIFF_20_NS in elem.tag else '1.2')
+                if version not in ('1.2', '2.0'):
+                    raise ValueError(f"❌ Unsupported XLIFF version: {version}")
+                target_lang = elem.attrib.get('trgLang', target_lang)
+            elif name == 'file':
+                translations = {}
+                sources = {}
+                if version == '2.0':
+                    original_name = elem.attrib.get('id')
+                else:
+                    original_name = elem.attrib.get('original')
+                    file_lang = elem.attrib.get('target-language', 'xx')
+                original_name = original_name or os.path.basename(file_path)
+            continue
+
+        if name in ('trans-unit', 'unit'):
+            if name == 'trans-unit':
+                key = elem.attrib.get('resname')
+                source = _text(_child(elem, 'source'))
+                target = _text(_child(elem, 'target'))
+            else:
+                key = elem.attrib.get('name') or elem.attrib.get('id')
+                source, target = _unit_texts(elem)
+            if key and (source is not None or target is not None):
+                if target is None or (fallback_to_source and not target):
+                    target = source
+                translations[key] = target or ''
+                sources[key] = source or ''
+            elem.clear()
+
+        elif name == 'file':
+            yield translations, original_name, file_lang if version == '1.2' else target_lang, sources
+            elem.clear()
+
+def read_xliff(file_path, fallback_to_source=False):
+    """Reads (translations, original_name, target_lang) of the first <file> of an XLIFF."""
+    for translations, original_name, target_lang, _ in iter_xliff_files(file_path, fallback_to_source):
+        return translations, original_name, target_lang
+    raise ValueError(f"❌ XLIFF: <file> element not found in {os.path.basename(file_path)}")
+
+def dedup_units(units):
+    """
+    Collapses units with identical source (and existing target) text into one unit,
+    named after the first key that uses it. Returns the unique units and a keymap
+    {key: unit_key} covering every original key in order.
+    """
+    unique = {}
+    keymap = {}
+    for key, source, target in units:
+        unit_key = unique.setdefault((source, target), key)
+        keymap[key] = unit_key
+    return [(key, source, target) for (source, target), key in unique.items()], keymap
+
+def expand_keymap(translations, keymap):
+    """Fans the translation of each deduplicated unit back out to all of its keys."""
+    return {key: translations[unit_key] for key, unit_key in keymap.items() if unit_key in translations}
+
+def keymap_path(xliff_path):
+    return os.path.splitext(xliff_path)[0] + KEYMAP_SUFFIX
+
+def save_keymap(keymaps, xliff_path):
+    """Writes the {original_name: {key: unit_key}} sidecar next to an XLIFF."""
+    with open(keymap_path(xliff_path), 'w', encoding='utf-8') as f:
+        json.dump(keymaps, f, ensure_ascii=False, indent=1)
+
+def load_keymap(xliff_path):
+    path = keymap_path(xliff_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)